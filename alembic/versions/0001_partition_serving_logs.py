@@ -0,0 +1,160 @@
+"""Partition serving_logs and serving_log_items by month on served_at
+
+Converts the tables as created by Base.metadata.create_all before partitioning: the
+rows are copied into range-partitioned tables (one partition per month, from the oldest
+serving through SERVING_LOG_PARTITIONS_AHEAD months ahead) with indexes on served_at
+and (meal_id, served_at). served_at becomes part of both primary keys and of the
+items -> logs foreign key. Serving logs without served_at get the oldest one.
+Databases older than the consumption snapshots have no serving_log_items: it is
+created empty (revision 0002 backfills it).
+
+Databases created after this change already have the partitioned tables; the upgrade
+does nothing there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.services.serving_partition import serving_partition_service
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Index names the tables share before and after, renamed out of the way meanwhile
+INDEXES = {
+    "serving_logs": ["serving_logs_pkey", "ix_serving_logs_served_at", "ix_serving_logs_meal_id_served_at"],
+    "serving_log_items": ["serving_log_items_pkey", "ix_serving_log_items_served_at"],
+}
+
+
+def _set_aside(suffix: str, tables: Sequence[str]) -> None:
+    """Renames the given tables and their indexes to <name>_<suffix>."""
+    for table in tables:
+        indexes = INDEXES[table]
+        op.rename_table(table, f"{table}_{suffix}")
+        for index in indexes:
+            op.execute(f"ALTER INDEX IF EXISTS {index} RENAME TO {index.replace(table, f'{table}_{suffix}', 1)}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("serving_logs") or serving_partition_service.is_partitioned(bind):
+        return
+    # serving_log_items is missing from databases older than the consumption snapshots.
+    existing = [table for table in INDEXES if inspector.has_table(table)]
+
+    op.execute(
+        "UPDATE serving_logs SET served_at = (SELECT coalesce(min(served_at), now()) FROM serving_logs) "
+        "WHERE served_at IS NULL"
+    )
+    _set_aside("unpartitioned", existing)
+
+    op.create_table(
+        "serving_logs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "meal_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("meals.id", name="serving_logs_meal_id_fkey"), nullable=False
+        ),
+        sa.Column(
+            "user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", name="serving_logs_user_id_fkey"), nullable=False
+        ),
+        sa.Column("served_at", sa.DateTime(), nullable=False),
+        sa.Column("portions", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "served_at"),
+        postgresql_partition_by="RANGE (served_at)",
+    )
+    op.create_index("ix_serving_logs_served_at", "serving_logs", ["served_at"])
+    op.create_index("ix_serving_logs_meal_id_served_at", "serving_logs", ["meal_id", "served_at"])
+    op.create_table(
+        "serving_log_items",
+        sa.Column("serving_log_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "ingredient_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("ingredients.id", name="serving_log_items_ingredient_id_fkey"), nullable=False
+        ),
+        sa.Column("grams", sa.BigInteger(), nullable=False),
+        sa.Column("served_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("serving_log_id", "ingredient_id", "served_at"),
+        sa.ForeignKeyConstraint(
+            ["serving_log_id", "served_at"], ["serving_logs.id", "serving_logs.served_at"], ondelete="CASCADE",
+            name="serving_log_items_serving_log_id_served_at_fkey",
+        ),
+        postgresql_partition_by="RANGE (served_at)",
+    )
+    op.create_index("ix_serving_log_items_served_at", "serving_log_items", ["served_at"])
+
+    oldest = bind.execute(sa.text("SELECT min(served_at) FROM serving_logs_unpartitioned")).scalar()
+    serving_partition_service.ensure_partitions(bind, start=oldest.date() if oldest else None)
+
+    op.execute(
+        "INSERT INTO serving_logs (id, meal_id, user_id, served_at, portions) "
+        "SELECT id, meal_id, user_id, served_at, portions FROM serving_logs_unpartitioned"
+    )
+    if "serving_log_items" in existing:
+        # served_at is taken from the log, which the new foreign key requires.
+        op.execute(
+            "INSERT INTO serving_log_items (serving_log_id, ingredient_id, grams, served_at) "
+            "SELECT i.serving_log_id, i.ingredient_id, i.grams, l.served_at "
+            "FROM serving_log_items_unpartitioned i JOIN serving_logs_unpartitioned l ON l.id = i.serving_log_id"
+        )
+        op.drop_table("serving_log_items_unpartitioned")
+    op.drop_table("serving_logs_unpartitioned")
+
+
+def downgrade() -> None:
+    """Downgrade schema. Months already archived (detached) are not brought back."""
+    bind = op.get_bind()
+    if not serving_partition_service.is_partitioned(bind):
+        return
+
+    _set_aside("partitioned", list(INDEXES))
+
+    op.create_table(
+        "serving_logs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "meal_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("meals.id", name="serving_logs_meal_id_fkey"), nullable=False
+        ),
+        sa.Column(
+            "user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", name="serving_logs_user_id_fkey"), nullable=False
+        ),
+        sa.Column("served_at", sa.DateTime(), nullable=True),
+        sa.Column("portions", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "serving_log_items",
+        sa.Column(
+            "serving_log_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("serving_logs.id", ondelete="CASCADE", name="serving_log_items_serving_log_id_fkey"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "ingredient_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("ingredients.id", name="serving_log_items_ingredient_id_fkey"), primary_key=True
+        ),
+        sa.Column("grams", sa.BigInteger(), nullable=False),
+        sa.Column("served_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_serving_log_items_served_at", "serving_log_items", ["served_at"])
+
+    op.execute(
+        "INSERT INTO serving_logs (id, meal_id, user_id, served_at, portions) "
+        "SELECT id, meal_id, user_id, served_at, portions FROM serving_logs_partitioned"
+    )
+    op.execute(
+        "INSERT INTO serving_log_items (serving_log_id, ingredient_id, grams, served_at) "
+        "SELECT serving_log_id, ingredient_id, grams, served_at FROM serving_log_items_partitioned"
+    )
+    # Dropping the parents drops their partitions.
+    op.drop_table("serving_log_items_partitioned")
+    op.drop_table("serving_logs_partitioned")
@@ -0,0 +1,145 @@
+"""Recipe item indexes, meal estimates, alerts and daily rollups
+
+Brings databases created before these changes to what Base.metadata.create_all builds
+today: the recipe_items indexes on meal_id and ingredient_id, and the meal_estimates,
+alerts, daily_meal_servings and daily_ingredient_usage tables with their indexes. Each
+is created only if missing, so databases created afterwards are left as they are.
+
+The new tables are filled from the existing data: the estimates of every meal, the
+consumption snapshots of serving logs recorded before snapshots existed, and the daily
+rollups of the whole (retained) history. Ingredients already at or below their
+threshold get their open low-stock alert.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models.ingredient import Ingredient
+from app.services.alert import alert_service
+from app.services.estimate import estimate_service
+from app.services.rollup import rollup_service
+from app.services.serving import serving_service
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN = sa.text("status != 'RESOLVED'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("recipe_items"):
+        return  # Empty database: the app creates the whole schema (see app/core/schema.py)
+
+    op.create_index("ix_recipe_items_meal_id", "recipe_items", ["meal_id"], if_not_exists=True)
+    op.create_index("ix_recipe_items_ingredient_id", "recipe_items", ["ingredient_id"], if_not_exists=True)
+
+    new_estimates = not inspector.has_table("meal_estimates")
+    if new_estimates:
+        op.execute("CREATE SEQUENCE IF NOT EXISTS meal_estimate_version_seq")
+        op.create_table(
+            "meal_estimates",
+            sa.Column(
+                "meal_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("meals.id", ondelete="CASCADE", name="meal_estimates_meal_id_fkey"), primary_key=True,
+            ),
+            sa.Column("max_portions_possible", sa.Integer(), nullable=False),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_meal_estimates_version", "meal_estimates", ["version"])
+
+    new_alerts = not inspector.has_table("alerts")
+    if new_alerts:
+        op.create_table(
+            "alerts",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("type", sa.Enum("LOW_STOCK", "DISCREPANCY", name="alerttype"), nullable=False),
+            sa.Column("status", sa.Enum("ACTIVE", "ACKNOWLEDGED", "RESOLVED", name="alertstatus"), nullable=False),
+            sa.Column("key", sa.String(100), nullable=False),
+            sa.Column(
+                "ingredient_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("ingredients.id", ondelete="CASCADE", name="alerts_ingredient_id_fkey"), nullable=True,
+            ),
+            sa.Column("message", sa.String(), nullable=False),
+            sa.Column("details", postgresql.JSONB(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("acknowledged_at", sa.DateTime(), nullable=True),
+            sa.Column(
+                "acknowledged_by_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("users.id", name="alerts_acknowledged_by_id_fkey"), nullable=True,
+            ),
+            sa.Column("resolved_at", sa.DateTime(), nullable=True),
+            sa.Column(
+                "resolved_by_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("users.id", name="alerts_resolved_by_id_fkey"), nullable=True,
+            ),
+        )
+        op.create_index("ix_alerts_ingredient_id", "alerts", ["ingredient_id"])
+        op.create_index("ix_alerts_open_key", "alerts", ["key"], unique=True, postgresql_where=OPEN)
+        op.create_index("ix_alerts_open_created_at", "alerts", ["created_at"], postgresql_where=OPEN)
+        op.create_index("ix_alerts_status_created_at", "alerts", ["status", "created_at"])
+
+    new_rollups = False
+    if not inspector.has_table("daily_meal_servings"):
+        new_rollups = True
+        op.create_table(
+            "daily_meal_servings",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column(
+                "meal_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("meals.id", name="daily_meal_servings_meal_id_fkey"), primary_key=True,
+            ),
+            sa.Column("portions", sa.BigInteger(), nullable=False),
+            sa.Column("servings", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_daily_meal_servings_meal_id", "daily_meal_servings", ["meal_id"])
+    if not inspector.has_table("daily_ingredient_usage"):
+        new_rollups = True
+        op.create_table(
+            "daily_ingredient_usage",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column(
+                "ingredient_id", postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("ingredients.id", name="daily_ingredient_usage_ingredient_id_fkey"), primary_key=True,
+            ),
+            sa.Column("used_grams", sa.BigInteger(), nullable=False),
+        )
+        op.create_index("ix_daily_ingredient_usage_ingredient_id", "daily_ingredient_usage", ["ingredient_id"])
+
+    # The services run in the migration's transaction and do not commit.
+    db = Session(bind=bind)
+    if new_estimates:
+        estimate_service.rebuild(db)
+    if new_rollups:
+        serving_service.backfill_consumption(db)
+        rollup_service.rebuild(db)
+    if new_alerts:
+        alert_service.sync_low_stock(db, ingredients=db.execute(sa.select(Ingredient)).scalars().all())
+    db.flush()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("daily_ingredient_usage")
+    op.drop_table("daily_meal_servings")
+    op.drop_table("alerts")
+    op.execute("DROP TYPE IF EXISTS alertstatus")
+    op.execute("DROP TYPE IF EXISTS alerttype")
+    op.drop_table("meal_estimates")
+    op.execute("DROP SEQUENCE IF EXISTS meal_estimate_version_seq")
+    op.drop_index("ix_recipe_items_ingredient_id", table_name="recipe_items", if_exists=True)
+    op.drop_index("ix_recipe_items_meal_id", table_name="recipe_items", if_exists=True)
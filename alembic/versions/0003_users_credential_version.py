@@ -0,0 +1,35 @@
+"""Credential version of users
+
+Tokens carried a digest of the password hash, so re-hashing a password at login (new
+bcrypt cost) revoked them. They now carry users.credential_version, which only password
+changes advance. Tokens issued before this revision no longer match: users log in again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("users"):
+        return  # Empty database: the app creates the whole schema (see app/core/schema.py)
+    op.add_column(
+        "users", sa.Column("credential_version", sa.Integer(), nullable=False, server_default="0"), if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "credential_version")
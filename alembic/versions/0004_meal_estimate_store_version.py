@@ -0,0 +1,39 @@
+"""Store version of meal estimates
+
+The version reported with the estimates was the highest version of the stored rows, so
+deleting a meal left it unchanged or moved it back. Removals now draw a version from
+meal_estimate_version_seq into the one-row meal_estimate_store_version table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("meal_estimates"):
+        return  # Empty database: the app creates the whole schema (see app/core/schema.py)
+    if not inspector.has_table("meal_estimate_store_version"):
+        op.create_table(
+            "meal_estimate_store_version",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("deleted_version", sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("meal_estimate_store_version")
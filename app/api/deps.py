@@ -1,9 +1,10 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core import security, database
@@ -23,25 +24,58 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(reusable_oauth2)
-) -> User:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async session for async endpoints; runs on the event loop, not the threadpool."""
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+def _decode_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenData(**payload)
+        return TokenData(**payload)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = user_service.get_by_username(db, username=token_data.username)
+
+def _check_principal(user: Optional[User]) -> User:
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(reusable_oauth2)
+) -> User:
+    token_data = _decode_token(token)
+    try:
+        # Usually served from the principal cache, without a query
+        user = user_service.get_principal(db, token_data=token_data)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    return _check_principal(user)
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(reusable_oauth2)
+) -> User:
+    """get_current_user for async endpoints (shares their AsyncSession)."""
+    token_data = _decode_token(token)
+    try:
+        user = await user_service.get_principal_async(db, token_data=token_data)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    return _check_principal(user)
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -49,6 +83,29 @@ def get_current_active_user(
     #     raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_active_user_async(
+    current_user: User = Depends(get_current_user_async)
+) -> User:
+    return current_user
+
+def get_read_db(current_user: User = Depends(get_current_user)) -> Generator:
+    """
+    Session for read-only endpoints: on a healthy replica when there is one, on the
+    primary otherwise or shortly after the client committed a write.
+    """
+    db = database.replica_router.read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(
+    current_user: User = Depends(get_current_user_async)
+) -> AsyncGenerator[AsyncSession, None]:
+    """get_read_db for async endpoints."""
+    async with await database.replica_router.async_read_session() as db:
+        yield db
+
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -1,32 +1,94 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.pagination import set_next_cursor
+from app.models.alert import AlertStatus as AlertStatusModel, AlertType as AlertTypeModel
 from app.models.user import User as UserModel, UserRole # For role checking
-from app.schemas.report import Alert as AlertSchema # Using the schema from report.py
+from app.schemas.report import Alert as AlertSchema, AlertStatus, AlertType # Using the schema from report.py
 from app.services.alert import alert_service
+from app.utils.validate_uuid import validate_uuid
 
 router = APIRouter()
 
+def _require_manager(current_user: UserModel, action: str) -> None:
+    if not (current_user.role == UserRole.ADMIN or current_user.role == UserRole.MANAGER):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not enough permissions to {action} alerts."
+        )
+
 @router.get("/", response_model=List[AlertSchema])
-def get_active_alerts_endpoint(
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_active_user) # Manager or Admin can view alerts
+async def get_active_alerts_endpoint(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    alert_status: Optional[AlertStatus] = Query(None, alias="status", description="Defaults to open (active or acknowledged) alerts"),
+    alert_type: Optional[AlertType] = Query(None, alias="type"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # Manager or Admin can view alerts
 ) -> Any:
     """
-    Returns active alerts (low stock, discrepancy >10%).
+    Returns stored alerts (low stock, discrepancy >10%), newest first, with pagination.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    Alerts are raised and cleared when stock or a month's figures change, so this is a plain read.
     Requires Manager or Admin role.
     """
-    if not (current_user.role == UserRole.ADMIN or current_user.role == UserRole.MANAGER):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to view alerts."
-        )
+    _require_manager(current_user, "view")
     try:
-        alerts = alert_service.get_active_alerts(db)
+        alerts = await alert_service.get_multi_async(
+            db,
+            status=AlertStatusModel(alert_status.value) if alert_status else None,
+            type=AlertTypeModel(alert_type.value) if alert_type else None,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error fetching alerts: {str(e)}")
+    set_next_cursor(response, alert_service.keyset.next_cursor(alerts, limit))
     return alerts
 
+@router.post("/{alert_id}/acknowledge", response_model=AlertSchema)
+def acknowledge_alert_endpoint(
+    alert_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user) # Manager or Admin can acknowledge
+) -> Any:
+    """
+    Acknowledges an open alert. It stays listed as open until resolved; a low-stock
+    alert is resolved automatically once the ingredient is restocked above its threshold.
+    Requires Manager or Admin role.
+    """
+    _require_manager(current_user, "acknowledge")
+    validate_uuid(alert_id)
+    alert = alert_service.get(db, alert_id=alert_id)
+    if not alert:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
+    try:
+        return alert_service.acknowledge(db, alert=alert, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/{alert_id}/resolve", response_model=AlertSchema)
+def resolve_alert_endpoint(
+    alert_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user) # Manager or Admin can resolve
+) -> Any:
+    """
+    Resolves an alert.
+    Requires Manager or Admin role.
+    """
+    _require_manager(current_user, "resolve")
+    validate_uuid(alert_id)
+    alert = alert_service.get(db, alert_id=alert_id)
+    if not alert:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
+    return alert_service.resolve(db, alert=alert, user_id=current_user.id)
@@ -10,7 +10,7 @@ from app.core import security
 from app.core.config import settings
 from app.models.user import User as UserModel
 from app.schemas.user import User as UserSchema, Token, UserCreate
-from app.services.user import user_service
+from app.services.user import principal_cache, user_service
 
 router = APIRouter()
 
@@ -40,14 +40,16 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login_access_token(
+async def login_access_token(
     db: Session = Depends(deps.get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
+    Async so that password verification (bcrypt, on its own bounded pool) never holds
+    one of the threads serving the other endpoints.
     """
-    user = user_service.authenticate(
+    user = await user_service.authenticate_async(
         db, username=form_data.username, password=form_data.password
     )
     if not user:
@@ -57,7 +59,13 @@ def login_access_token(
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": user.username, "username": user.username}, expires_delta=access_token_expires
+        data={
+            "sub": user.username,
+            "username": user.username,
+            "uid": str(user.id),
+            "pv": security.password_version(user.credential_version),
+        },
+        expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
@@ -72,3 +80,13 @@ def read_users_me(
     Get current user.
     """
     return current_user
+
+@router.get("/principal-cache", response_model=Dict[str, Any])
+def read_principal_cache_stats(
+    current_user: UserModel = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Hit rate and size of this worker's cache of authenticated users.
+    Requires Admin role.
+    """
+    return principal_cache.stats()
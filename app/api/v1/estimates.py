@@ -1,7 +1,8 @@
-from typing import List, Any
+import zlib
+from typing import List, Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Header, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.models.user import User as UserModel, UserRole
@@ -12,24 +13,37 @@ from app.tasks.estimates import recalculate_estimates
 router = APIRouter()
 
 @router.get("/", response_model=List[MealEstimate])
-def get_meal_estimations(
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_active_user)
+async def get_meal_estimations(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    if_none_match: Optional[str] = Header(None),
+    current_user: UserModel = Depends(deps.get_current_active_user_async)
 ) -> Any:
     """
     Returns the maximum portions possible for each meal based on current inventory.
+    Estimates are maintained incrementally on every stock or recipe change, so this is a plain read.
+    The X-Estimates-Version header (and ETag) changes whenever any estimate changes;
+    send the ETag back in If-None-Match to get a 304 when nothing changed.
     Accessible by all authenticated users.
     """
     try:
-        # Direct calculation for immediate results
-        estimations = estimate_service.calculate_max_portions_for_all_meals(db)
-        return estimations
+        estimations, version = await estimate_service.get_estimates_async(db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"An unexpected error occurred during estimation: {str(e)}"
         )
 
+    # Versions are drawn when a refresh runs, not when it commits, so two refreshes of
+    # different meals can become visible out of order; the ETag also covers the content.
+    checksum = zlib.crc32(repr([(str(e.meal_id), e.max_portions_possible) for e in estimations]).encode())
+    etag = f'"{version}-{checksum:08x}"'
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["X-Estimates-Version"] = str(version)
+    return estimations
+
 @router.post("/recalculate", response_model=dict)
 def trigger_estimate_recalculation(
     background_tasks: BackgroundTasks,
@@ -1,9 +1,11 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.pagination import set_next_cursor
 from app.models.user import User as UserModel, UserRole
 from app.models.ingredient import Ingredient as IngredientModel
 from app.schemas.ingredient import Ingredient as IngredientSchema, IngredientCreate, IngredientUpdate
@@ -37,31 +39,41 @@ def create_ingredient(
     return ingredient
 
 @router.get("/", response_model=List[IngredientSchema])
-def read_ingredients(
-    db: Session = Depends(deps.get_db),
+async def read_ingredients(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = Query(None, alias="search"),
-    current_user: UserModel = Depends(deps.get_current_active_user) # All authenticated users can view
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # All authenticated users can view
 ) -> Any:
     """
-    Retrieve ingredients with pagination and search.
+    Retrieve ingredients by name with pagination and search.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
     Accessible by all authenticated users.
     """
-    ingredients = ingredient_service.get_multi(db, skip=skip, limit=limit, search=search)
+    try:
+        ingredients = await ingredient_service.get_multi_async(db, skip=skip, limit=limit, search=search, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, ingredient_service.keyset.next_cursor(ingredients, limit))
     return ingredients
 
 @router.get("/{ingredient_id}", response_model=IngredientSchema)
-def read_ingredient_by_id(
+async def read_ingredient_by_id(
     ingredient_id: str, # Assuming UUID is passed as string
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_active_user) # All authenticated users can view
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # All authenticated users can view
 ) -> Any:
     """
     Get a specific ingredient by id.
     Accessible by all authenticated users.
     """
-    ingredient = ingredient_service.get(db, id=ingredient_id)
+    try:
+        ingredient = await ingredient_service.get_async(db, id=ingredient_id)
+    except ValueError:  # Not a UUID
+        ingredient = None
     if not ingredient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingredient not found")
     return ingredient
@@ -1,163 +1,150 @@
 import os
-import glob
+import gzip
+import json
 from typing import Any, List, Optional
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api import deps
 from app.models.user import User as UserModel, UserRole
 from app.core.config import settings
+from app.services.log_stream import log_stream_hub
+from app.services.logs import COMPRESSED_SUFFIX, LogSearch, is_compressed, log_service
 
 router = APIRouter()
 
 
+def _require_log_access(current_user: UserModel) -> None:
+    # Authorization: Only Manager or Admin can view logs
+    if not (current_user.role == UserRole.ADMIN or current_user.role == UserRole.MANAGER):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view system logs."
+        )
+
+def _start_search(log_type, limit, level, search, since, until, cursor) -> LogSearch:
+    try:
+        return log_service.search(
+            log_service.find_log_files(log_type=log_type),
+            limit=limit, level=level, search=search, since=since, until=until, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/", response_model=dict)
 def get_all_logs(
         db: Session = Depends(deps.get_db),
         current_user: UserModel = Depends(deps.get_current_active_user),
         log_type: Optional[str] = Query(None, description="Filter by log type (application, error, access)"),
-        limit: int = Query(100, description="Maximum number of log entries to return"),
+        limit: int = Query(100, ge=1, le=10000, description="Maximum number of log entries to return"),
         level: Optional[str] = Query(None, description="Filter by log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)"),
-        search: Optional[str] = Query(None, description="Search term to filter log entries")
+        search: Optional[str] = Query(None, description="Search term to filter log entries"),
+        since: Optional[datetime] = Query(None, alias="from", description="Only entries at or after this time (ISO format)"),
+        until: Optional[datetime] = Query(None, alias="to", description="Only entries at or before this time (ISO format)"),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
 ) -> Any:
     """
-    Retrieve all application logs.
+    Retrieve the most recent application log entries matching the filters, newest first
+    across all files. Pass `next_cursor` back as `cursor` for the next (older) page.
+    For large result sets use /logs/search, which streams the entries.
     Requires Manager or Admin role for security reasons.
     """
-    # Authorization: Only Manager or Admin can view logs
-    if not (current_user.role == UserRole.ADMIN or current_user.role == UserRole.MANAGER):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to view system logs."
-        )
+    _require_log_access(current_user)
+    log_search = _start_search(log_type, limit, level, search, since, until, cursor)
 
     try:
-        # Define potential log file locations
-        log_directories = [
-            "./logs",
-            "/var/log/kindergarten-kitchen",
-            "/app/logs",
-            "./app/logs"
-        ]
-
-        log_files = []
-
-        # Search for log files in various locations
-        for log_dir in log_directories:
-            if os.path.exists(log_dir):
-                # Common log file patterns
-                patterns = [
-                    f"{log_dir}/*.log",
-                    f"{log_dir}/*.txt",
-                    f"{log_dir}/application*.log",
-                    f"{log_dir}/error*.log",
-                    f"{log_dir}/access*.log"
-                ]
-
-                for pattern in patterns:
-                    log_files.extend(glob.glob(pattern))
-
-        # Also check for common log files in current directory
-        current_dir_patterns = [
-            "*.log",
-            "app.log",
-            "error.log",
-            "access.log",
-            "application.log"
-        ]
-
-        for pattern in current_dir_patterns:
-            log_files.extend(glob.glob(pattern))
-
-        # Remove duplicates and sort by modification time (newest first)
-        log_files = list(set(log_files))
-        log_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-
-        all_logs = []
-        total_entries = 0
-
-        for log_file in log_files:
-            if total_entries >= limit:
-                break
-
-            try:
-                # Filter by log type if specified
-                if log_type:
-                    file_name = os.path.basename(log_file).lower()
-                    if log_type.lower() not in file_name:
-                        continue
-
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-
-                # Process log lines (newest first)
-                for line in reversed(lines[-1000:]):  # Limit to last 1000 lines per file
-                    if total_entries >= limit:
-                        break
-
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Filter by log level if specified
-                    if level:
-                        if level.upper() not in line.upper():
-                            continue
-
-                    # Filter by search term if specified
-                    if search:
-                        if search.lower() not in line.lower():
-                            continue
-
-                    # Parse log entry
-                    log_entry = {
-                        "timestamp": extract_timestamp(line),
-                        "level": extract_log_level(line),
-                        "source_file": os.path.basename(log_file),
-                        "message": line,
-                        "file_path": log_file
-                    }
-
-                    all_logs.append(log_entry)
-                    total_entries += 1
-
-            except Exception as e:
-                # If we can't read a specific file, log the error but continue
-                error_entry = {
-                    "timestamp": datetime.now().isoformat(),
-                    "level": "ERROR",
-                    "source_file": os.path.basename(log_file),
-                    "message": f"Error reading log file: {str(e)}",
-                    "file_path": log_file
-                }
-                all_logs.append(error_entry)
-                total_entries += 1
-
-        # Sort all logs by timestamp (newest first)
-        all_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-
-        return {
-            "status": "success",
-            "total_entries": len(all_logs),
-            "log_files_found": len(log_files),
-            "filters_applied": {
-                "log_type": log_type,
-                "level": level,
-                "search": search,
-                "limit": limit
-            },
-            "logs": all_logs[:limit]  # Ensure we don't exceed the limit
-        }
-
+        all_logs = list(log_search)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving logs: {str(e)}"
         )
 
+    return {
+        "status": "success",
+        "total_entries": len(all_logs),
+        "log_files_found": len(log_search.files),
+        "filters_applied": {
+            "log_type": log_type,
+            "level": level,
+            "search": search,
+            "from": since,
+            "to": until,
+            "limit": limit
+        },
+        "logs": all_logs,
+        "next_cursor": log_search.next_cursor
+    }
+
+
+@router.get("/search")
+def search_logs(
+        current_user: UserModel = Depends(deps.get_current_active_user),
+        log_type: Optional[str] = Query(None, description="Filter by log type (application, error, access)"),
+        limit: int = Query(1000, ge=1, le=1000000, description="Maximum number of log entries to stream"),
+        level: Optional[str] = Query(None, description="Filter by log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)"),
+        search: Optional[str] = Query(None, description="Search term to filter log entries"),
+        since: Optional[datetime] = Query(None, alias="from", description="Only entries at or after this time (ISO format)"),
+        until: Optional[datetime] = Query(None, alias="to", description="Only entries at or before this time (ISO format)"),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+) -> Any:
+    """
+    Streams matching log entries as NDJSON (one JSON object per line), newest first
+    across all files, as they are found. All files are scanned concurrently and merged
+    by timestamp, so memory use does not grow with `limit`. The last line is
+    {"next_cursor": ...}, to pass back as `cursor` for the next page (null at the end).
+    Requires Manager or Admin role.
+    """
+    _require_log_access(current_user)
+    log_search = _start_search(log_type, limit, level, search, since, until, cursor)
+
+    def ndjson():
+        try:
+            for entry in log_search:
+                yield json.dumps(entry) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error retrieving logs: {str(e)}"}) + "\n"
+            return
+        yield json.dumps({"next_cursor": log_search.next_cursor}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.get("/stream")
+async def stream_logs(
+        current_user: UserModel = Depends(deps.get_current_active_user),
+        log_type: Optional[str] = Query(None, description="Filter by log type (application, error, access)"),
+        level: Optional[str] = Query(None, description="Filter by log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)"),
+        search: Optional[str] = Query(None, description="Search term to filter log entries")
+) -> Any:
+    """
+    Live tail of the active log files as Server-Sent Events: every new matching line is
+    sent as a `log` event whose data is the JSON entry, like `tail -F` (rotation and
+    truncation are followed). Files are watched once per server process however many
+    viewers are connected; filters are applied server-side.
+    Requires Manager or Admin role.
+    """
+    _require_log_access(current_user)
+    log_files = log_service.find_log_files(log_type=log_type, include_rotated=False)
+
+    async def events():
+        yield ": following " + ", ".join(os.path.basename(path) for path in log_files) + "\n\n"
+        async for entry in log_stream_hub.follow(log_files, level=level, search=search):
+            if entry is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: log\ndata: {json.dumps(entry)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.get("/files", response_model=dict)
 def get_log_files(
@@ -174,50 +161,19 @@ def get_log_files(
         )
 
     try:
-        log_directories = [
-            "./logs",
-            "/var/log/kindergarten-kitchen",
-            "/app/logs",
-            "./app/logs"
-        ]
-
         found_files = []
 
-        for log_dir in log_directories:
-            if os.path.exists(log_dir):
-                patterns = [
-                    f"{log_dir}/*.log",
-                    f"{log_dir}/*.txt"
-                ]
-
-                for pattern in patterns:
-                    files = glob.glob(pattern)
-                    for file_path in files:
-                        stat = os.stat(file_path)
-                        found_files.append({
-                            "file_path": file_path,
-                            "file_name": os.path.basename(file_path),
-                            "size_bytes": stat.st_size,
-                            "size_mb": round(stat.st_size / (1024 * 1024), 2),
-                            "last_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                            "directory": log_dir
-                        })
-
-        # Also check current directory
-        current_patterns = ["*.log", "app.log", "error.log", "access.log"]
-        for pattern in current_patterns:
-            files = glob.glob(pattern)
-            for file_path in files:
-                if file_path not in [f["file_path"] for f in found_files]:
-                    stat = os.stat(file_path)
-                    found_files.append({
-                        "file_path": file_path,
-                        "file_name": os.path.basename(file_path),
-                        "size_bytes": stat.st_size,
-                        "size_mb": round(stat.st_size / (1024 * 1024), 2),
-                        "last_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "directory": "."
-                    })
+        for file_path in log_service.find_log_files():
+            stat = os.stat(file_path)
+            found_files.append({
+                "file_path": file_path,
+                "file_name": os.path.basename(file_path),
+                "size_bytes": stat.st_size,
+                "size_mb": round(stat.st_size / (1024 * 1024), 2),
+                "last_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "directory": os.path.dirname(file_path) or ".",
+                "compressed": is_compressed(file_path)
+            })
 
         # Sort by last modified (newest first)
         found_files.sort(key=lambda x: x["last_modified"], reverse=True)
@@ -235,13 +191,21 @@ def get_log_files(
         )
 
 
+def _decompressed_chunks(file_path: str):
+    with gzip.open(file_path, "rb") as f:
+        while chunk := f.read(settings.LOG_READ_BLOCK_BYTES):
+            yield chunk
+
+
 @router.get("/download/{file_name}")
 def download_log_file(
         file_name: str,
+        decompress: bool = Query(False, description="Stream a .gz file decompressed (no Range support)"),
         current_user: UserModel = Depends(deps.get_current_active_user)
 ) -> Any:
     """
-    Download a specific log file.
+    Download a specific log file, rotated and compressed ones included.
+    Supports Range requests, except when decompressing.
     Requires Manager or Admin role.
     """
     if not (current_user.role == UserRole.ADMIN or current_user.role == UserRole.MANAGER):
@@ -250,27 +214,8 @@ def download_log_file(
             detail="Not enough permissions to download log files."
         )
 
-    # Security: Only allow downloading .log and .txt files
-    if not (file_name.endswith('.log') or file_name.endswith('.txt')):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only .log and .txt files can be downloaded."
-        )
-
-    # Search for the file in known log directories
-    search_paths = [
-        f"./logs/{file_name}",
-        f"/var/log/kindergarten-kitchen/{file_name}",
-        f"/app/logs/{file_name}",
-        f"./app/logs/{file_name}",
-        f"./{file_name}"
-    ]
-
-    file_path = None
-    for path in search_paths:
-        if os.path.exists(path):
-            file_path = path
-            break
+    # Security: only files found by log discovery can be downloaded, looked up by exact name
+    file_path = log_service.find_log_file(file_name)
 
     if not file_path:
         raise HTTPException(
@@ -278,10 +223,18 @@ def download_log_file(
             detail=f"Log file '{file_name}' not found."
         )
 
+    if is_compressed(file_path) and decompress:
+        return StreamingResponse(
+            _decompressed_chunks(file_path),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{file_name[:-len(COMPRESSED_SUFFIX)]}"'}
+        )
+
     try:
+        # Streamed in chunks, with Range support (resumable downloads)
         return FileResponse(
             file_path,
-            media_type="text/plain",
+            media_type="application/gzip" if is_compressed(file_path) else "text/plain",
             filename=file_name
         )
     except Exception as e:
@@ -289,44 +242,3 @@ def download_log_file(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error downloading file: {str(e)}"
         )
-
-
-def extract_timestamp(log_line: str) -> str:
-    """Extract timestamp from log line if present, otherwise return current time."""
-    try:
-        # Common timestamp patterns
-        import re
-
-        # ISO format: 2025-06-02T05:33:47
-        iso_pattern = r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}'
-        match = re.search(iso_pattern, log_line)
-        if match:
-            return match.group(0)
-
-        # Other common formats
-        timestamp_patterns = [
-            r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',  # 2025-06-02 05:33:47
-            r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}',  # 06/02/2025 05:33:47
-            r'\w{3} \d{2} \d{2}:\d{2}:\d{2}',  # Jun 02 05:33:47
-        ]
-
-        for pattern in timestamp_patterns:
-            match = re.search(pattern, log_line)
-            if match:
-                return match.group(0)
-
-        return datetime.now().isoformat()
-    except:
-        return datetime.now().isoformat()
-
-
-def extract_log_level(log_line: str) -> str:
-    """Extract log level from log line."""
-    levels = ["CRITICAL", "ERROR", "WARNING", "WARN", "INFO", "DEBUG"]
-    line_upper = log_line.upper()
-
-    for level in levels:
-        if level in line_upper:
-            return level
-
-    return "INFO"  # Default level
\ No newline at end of file
@@ -1,10 +1,12 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.utils.validate_uuid import validate_uuid
 from app.api import deps
+from app.core.pagination import set_next_cursor
 from app.models.user import User as UserModel, UserRole
 from app.models.meal import Meal as MealModel
 from app.schemas.meal import (
@@ -47,17 +49,24 @@ def create_meal(
     return meal
 
 @router.get("/", response_model=List[MealWithRecipeSummary])
-def read_meals(
-    db: Session = Depends(deps.get_db),
+async def read_meals(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: UserModel = Depends(deps.get_current_active_user) # All authenticated users can view
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # All authenticated users can view
 ) -> Any:
     """
-    Retrieve meals with recipe summary (ingredient count, total grams).
+    Retrieve meals by name with recipe summary (ingredient count, total grams).
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
     Accessible by all authenticated users.
     """
-    meals_data = meal_service.get_multi_with_summary(db, skip=skip, limit=limit)
+    try:
+        meals_data = await meal_service.get_multi_with_summary_async(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, meal_service.keyset.next_cursor([meal for meal, _, _ in meals_data], limit))
     results = []
     for meal, item_count, total_grams in meals_data:
         results.append(
@@ -73,10 +82,10 @@ def read_meals(
     return results
 
 @router.get("/{meal_id}", response_model=MealWithFullRecipe)
-def read_meal_by_id(
+async def read_meal_by_id(
     meal_id: str,
-    db: Session = Depends(deps.get_db),
-    current_user: UserModel = Depends(deps.get_current_active_user)
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: UserModel = Depends(deps.get_current_active_user_async)
 ) -> Any:
     """
     Get a specific meal by id with full recipe details.
@@ -84,7 +93,7 @@ def read_meal_by_id(
     """
     try:
         validate_uuid(meal_id)
-        meal = meal_service.get(db, id=meal_id)
+        meal = await meal_service.get_with_recipe_async(db, id=meal_id)
         if not meal:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meal not found")
         return meal 
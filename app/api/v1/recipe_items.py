@@ -1,10 +1,11 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 
 from app.utils.validate_uuid import validate_uuid
 from app.api import deps
+from app.core.pagination import set_next_cursor
 from app.models.user import User as UserModel, UserRole
 from app.models.recipe_item import RecipeItem as RecipeItemModel
 from app.models.meal import Meal as MealModel
@@ -94,15 +95,18 @@ def create_recipe_item(
 
 @router.get("/", response_model=List[RecipeItemSchema])
 def read_recipe_items(
-        db: Session = Depends(deps.get_db),
+        response: Response,
+        db: Session = Depends(deps.get_read_db),
         skip: int = Query(0, ge=0, description="Number of records to skip"),
         limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
         meal_id: Optional[str] = Query(None, description="Filter by meal ID"),
         ingredient_id: Optional[str] = Query(None, description="Filter by ingredient ID"),
+        cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
         current_user: UserModel = Depends(deps.get_current_active_user)
 ) -> Any:
     """
     Retrieve recipe items with optional filtering.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
     Accessible by all authenticated users.
     """
     try:
@@ -116,20 +120,25 @@ def read_recipe_items(
             detail=f"Invalid UUID format: {str(e)}"
         )
 
-    recipe_items = recipe_item_service.get_multi(
-        db,
-        skip=skip,
-        limit=limit,
-        meal_id=meal_id,
-        ingredient_id=ingredient_id
-    )
+    try:
+        recipe_items = recipe_item_service.get_multi(
+            db,
+            skip=skip,
+            limit=limit,
+            meal_id=meal_id,
+            ingredient_id=ingredient_id,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, recipe_item_service.keyset.next_cursor(recipe_items, limit))
     return recipe_items
 
 
 @router.get("/{recipe_item_id}", response_model=RecipeItemSchema)
 def read_recipe_item_by_id(
         recipe_item_id: str,
-        db: Session = Depends(deps.get_db),
+        db: Session = Depends(deps.get_read_db),
         current_user: UserModel = Depends(deps.get_current_active_user)
 ) -> Any:
     """
@@ -156,7 +165,7 @@ def read_recipe_item_by_id(
 @router.get("/meal/{meal_id}", response_model=List[RecipeItemSchema])
 def read_recipe_items_by_meal(
         meal_id: str,
-        db: Session = Depends(deps.get_db),
+        db: Session = Depends(deps.get_read_db),
         current_user: UserModel = Depends(deps.get_current_active_user)
 ) -> Any:
     """
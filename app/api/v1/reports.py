@@ -14,7 +14,7 @@ router = APIRouter()
 
 @router.get("/ingredient-usage", response_model=List[IngredientUsageReportItem])
 def get_ingredient_usage_report(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     start_date: DateObject = Query(..., alias="from", description="Start date in YYYY-MM-DD format"),
     end_date: DateObject = Query(..., alias="to", description="End date in YYYY-MM-DD format"),
     current_user: UserModel = Depends(deps.get_current_active_user)
@@ -46,7 +46,7 @@ def get_ingredient_usage_report(
 
 @router.get("/monthly-summary", response_model=MonthlySummaryReport)
 def get_monthly_summary_report(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     month_str: str = Query(..., alias="month", description="Month in YYYY-MM format"),
     current_user: UserModel = Depends(deps.get_current_active_user) # Manager or Admin can view
 ) -> Any:
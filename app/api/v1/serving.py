@@ -1,22 +1,32 @@
-from typing import Any, List
+from datetime import datetime
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.pagination import set_next_cursor
 from app.models.user import User as UserModel, UserRole
-from app.schemas.serving_log import ServeMealRequest, ServingLog as ServingLogSchema
+from app.schemas.serving_log import (
+    ServeMealRequest,
+    ServingLog as ServingLogSchema,
+    ServeBatchRequest,
+    ServeBatchResponse,
+)
 from app.services.serving import serving_service
+from app.services.stock import InsufficientStockError
 
 router = APIRouter()
 
 @router.post("/{meal_id}/serve", response_model=ServingLogSchema)
-def serve_meal_endpoint(
+async def serve_meal_endpoint(
     *, 
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     meal_id: str, # Assuming UUID is passed as string
     serve_request: ServeMealRequest,
-    current_user: UserModel = Depends(deps.get_current_active_user) # Cook, Manager or Admin can serve
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # Cook, Manager or Admin can serve
 ) -> Any:
     """
     Serve a meal: calculates ingredient needs, validates inventory, deducts stock, and logs serving.
@@ -35,12 +45,17 @@ def serve_meal_endpoint(
     # For now, we'll pass current_user.id as the one performing the action to the service layer.
     # The service layer currently uses serve_request.user_id as per spec for logging.
     try:
-        serving_log = serving_service.serve_meal(
+        serving_log = await serving_service.serve_meal_async(
             db,
             meal_id=meal_id,
             serve_request=serve_request,
             serving_user_id=str(current_user.id) # Pass the authenticated user's ID
         )
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": str(e), "shortages": jsonable_encoder(e.shortages)}
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -53,15 +68,66 @@ def serve_meal_endpoint(
     return serving_log
 
 
+@router.post("/serve-batch", response_model=ServeBatchResponse)
+async def serve_batch_endpoint(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    batch_request: ServeBatchRequest,
+    current_user: UserModel = Depends(deps.get_current_active_user_async) # Cook, Manager or Admin can serve
+) -> Any:
+    """
+    Serve several meals (e.g. a whole lunch service) in one transaction.
+    With mode=all_or_nothing (default) nothing is served unless every item can be;
+    with mode=best_effort the items the inventory covers are served and the rest are returned as rejected.
+    Requires Cook, Manager, or Admin role.
+    """
+    if not (current_user.role == UserRole.COOK or
+            current_user.role == UserRole.MANAGER or
+            current_user.role == UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to serve a meal."
+        )
+
+    try:
+        result = await serving_service.serve_batch_async(
+            db,
+            batch_request=batch_request,
+            serving_user_id=str(current_user.id)
+        )
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": str(e), "shortages": jsonable_encoder(e.shortages)}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    return result
+
 
 @router.get("/serve", response_model=List[ServingLogSchema])
 def read_all_serving_logs(
-    db: Session = Depends(deps.get_db),
+    response: Response,
+    db: Session = Depends(deps.get_read_db),
+    served_from: Optional[datetime] = Query(None, alias="from", description="Only logs served at or after this time"),
+    served_to: Optional[datetime] = Query(None, alias="to", description="Only logs served before this time"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user: UserModel = Depends(deps.get_current_active_user)
 ) -> Any:
     """
-    Retrieve all serving logs.
+    Retrieve serving logs, most recent first, optionally within a time range.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
     Accessible to authorized users.
     """
     # Optionally, you could enforce role-based restrictions here if needed.
-    return serving_service.get_all(db)
+    try:
+        logs = serving_service.get_all(db, start=served_from, end=served_to, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, serving_service.keyset.next_cursor(logs, limit))
+    return logs
@@ -1,9 +1,10 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.pagination import set_next_cursor
 from app.models.user import User as UserModel, UserRole
 from app.schemas.user import User as UserSchema, UserCreate, UserUpdate
 from app.services.user import user_service
@@ -37,15 +38,22 @@ def create_user(
 
 @router.get("/", response_model=List[UserSchema])
 def read_users(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user: UserModel = Depends(deps.get_current_active_superuser)
 ) -> Any:
     """
-    Retrieve users.
+    Retrieve users by username.
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
     """
-    users = db.query(UserModel).offset(skip).limit(limit).all() # Basic pagination, can be improved
+    try:
+        users = user_service.get_multi(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_cursor(response, user_service.keyset.next_cursor(users, limit))
     return users
 
 @router.get("/{user_id}", response_model=UserSchema)
@@ -96,7 +104,5 @@ def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # Add logic here to check if user can be deleted (e.g., not deleting self, or other constraints)
-    db.delete(user)
-    db.commit()
-    return user
+    return user_service.remove(db, db_obj=user)
 
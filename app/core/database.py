@@ -1,14 +1,171 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
+from .read_your_writes import primary_required
+from .metrics import TimedAsyncQueuePool, TimedQueuePool, observe_engine
+from .sql_instrumentation import instrument_engines
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Query timing for the slow-query log and per-request stats, on every engine below
+instrument_engines()
+
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_pre_ping": True,
+}
+
+def _create_engine(url: str, name: str, **kwargs):
+    """A sync engine whose pool is exported to /metrics as `name`."""
+    created = create_engine(url, poolclass=TimedQueuePool, pool_logging_name=name, **POOL_OPTIONS, **kwargs)
+    observe_engine(name, created)
+    return created
+
+def _create_async_engine(url: str, name: str, **kwargs):
+    """An async engine whose pool is exported to /metrics as `name`."""
+    created = create_async_engine(url, poolclass=TimedAsyncQueuePool, pool_logging_name=name, **POOL_OPTIONS, **kwargs)
+    observe_engine(name, created.sync_engine)
+    return created
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL, "primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def async_database_url(url: str, override: Optional[str] = None) -> str:
+    """The asyncpg flavour of a PostgreSQL URL (postgresql[+driver]:// -> postgresql+asyncpg://)."""
+    if override:
+        return override
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+# Async path for the hot endpoints: same database, its own pool. Sync sessions remain the
+# default everywhere else (Celery tasks, scripts, less frequent endpoints).
+async_engine = _create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL, settings.ASYNC_DATABASE_URL), "primary_async"
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Seconds the replica is behind the primary: 0 when it replayed everything it received
+# (or is not a standby at all), NULL when it never replayed anything yet.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+class Replica:
+    """A read replica: its sync and async engines and the outcome of its last health check."""
+
+    def __init__(self, url: str, name: str = "replica"):
+        self.url = url
+        self.name = name
+        self.engine = _create_engine(
+            url, name, connect_args={"connect_timeout": int(settings.DB_REPLICA_CONNECT_TIMEOUT_SECONDS)}
+        )
+        self.async_engine = _create_async_engine(
+            async_database_url(url), f"{name}_async", connect_args={"timeout": settings.DB_REPLICA_CONNECT_TIMEOUT_SECONDS}
+        )
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at = float("-inf")
+        self._checking = threading.Lock()
+        # A lost connection marks the replica down at once instead of at the next check.
+        event.listen(self.engine, "handle_error", self._on_error)
+        event.listen(self.async_engine.sync_engine, "handle_error", self._on_error)
+
+    @property
+    def usable(self) -> bool:
+        return self.healthy and self.lag is not None and self.lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= settings.DB_REPLICA_CHECK_SECONDS
+
+    def check(self) -> None:
+        """Measures the replica's lag (blocking). Skipped if another thread is already checking it."""
+        if not self._checking.acquire(blocking=False):
+            return
+        try:
+            with self.engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_QUERY).scalar()
+            self.healthy, self.lag, self.error = True, None if lag is None else float(lag), None
+        except Exception as e:
+            self.healthy, self.lag, self.error = False, None, str(e)
+        finally:
+            self.checked_at = time.monotonic()
+            self._checking.release()
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            self.healthy, self.error = False, str(context.original_exception)
+            self.checked_at = time.monotonic()
+
+class ReplicaRouter:
+    """
+    Routes read-only sessions to the configured replicas, round-robin among those whose
+    last health check found them up and not lagging, and to the primary when there are
+    none, when none is usable, or while the client wrote recently (read-your-writes, see
+    app/core/read_your_writes.py).
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url, f"replica{index}") for index, url in enumerate(urls)]
+        self._turn = itertools.count()
+
+    def _pick(self) -> Optional[Replica]:
+        if primary_required():
+            return None
+        usable = [replica for replica in self.replicas if replica.usable]
+        if not usable:
+            return None
+        return usable[next(self._turn) % len(usable)]
+
+    def _due(self) -> List[Replica]:
+        return [replica for replica in self.replicas if replica.check_due()]
+
+    def pick(self) -> Optional[Replica]:
+        """The replica to read from, or None for the primary. May run due health checks (blocking)."""
+        for replica in self._due():
+            replica.check()
+        return self._pick()
+
+    async def pick_async(self) -> Optional[Replica]:
+        """pick, with the due health checks run in a thread."""
+        due = self._due()
+        if due:
+            await asyncio.gather(*(asyncio.to_thread(replica.check) for replica in due))
+        return self._pick()
+
+    def read_session(self) -> Session:
+        if not self.replicas:
+            return SessionLocal()
+        replica = self.pick()
+        return SessionLocal() if replica is None else SessionLocal(bind=replica.engine)
+
+    async def async_read_session(self) -> AsyncSession:
+        if not self.replicas:
+            return AsyncSessionLocal()
+        replica = await self.pick_async()
+        return AsyncSessionLocal() if replica is None else AsyncSessionLocal(bind=replica.async_engine)
+
+    async def dispose_async(self) -> None:
+        for replica in self.replicas:
+            await replica.async_engine.dispose()
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,4 +174,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import settings
+
+# Metrics of this process. Each API process serves its own /metrics; Celery workers expose
+# theirs on CELERY_METRICS_PORT. With PROMETHEUS_MULTIPROC_DIR set (several API workers
+# behind one port, prefork Celery pools), counters and histograms of all processes are
+# aggregated from that directory, and the gauges are those of the process scraped.
+
+# --- HTTP ---
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response is fully sent.", ["method", "route"]
+)
+
+# --- Database pools ---
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool (waiting for a free one or opening a new one).",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+class _TimedCheckout:
+    """Pool mixin observing DB_POOL_CHECKOUT_WAIT, labelled with the pool's logging name."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self._orig_logging_name or "default").observe(time.perf_counter() - started)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+# --- Celery ---
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time, by task name and final state.",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+# --- Domain ---
+
+SERVINGS = Counter("kitchen_servings_total", "Meals served (one per served meal, batches included).")
+PORTIONS_SERVED = Counter("kitchen_portions_served_total", "Portions served.")
+SERVE_REJECTIONS = Counter(
+    "kitchen_serve_rejections_total",
+    "Serve requests (or batch items) rejected, by reason: insufficient_stock or invalid.",
+    ["reason"],
+)
+WS_EVICTIONS = Counter("ws_evictions_total", "WebSocket clients dropped for being too slow or gone.")
+
+class _StateCollector(Collector):
+    """
+    Gauges read when scraped from live objects registered at import time: engine pools,
+    the WebSocket connection manager and TTL caches. Nothing is computed per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engines: Dict[str, Any] = {}
+        self.caches: Dict[str, Any] = {}
+        self.websocket_managers: List[Any] = []
+
+    def collect(self):
+        with self._lock:
+            engines, caches, managers = dict(self.engines), dict(self.caches), list(self.websocket_managers)
+
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections currently checked out.", labels=["pool"])
+        capacity = GaugeMetricFamily("db_pool_capacity", "pool_size + max_overflow.", labels=["pool"])
+        saturation = GaugeMetricFamily("db_pool_saturation", "Checked-out connections / capacity.", labels=["pool"])
+        for name, engine in engines.items():
+            pool = engine.pool
+            in_use, limit = pool.checkedout(), pool.size() + settings.DB_MAX_OVERFLOW
+            checked_out.add_metric([name], in_use)
+            capacity.add_metric([name], limit)
+            saturation.add_metric([name], in_use / limit if limit else 0)
+        yield from (checked_out, capacity, saturation)
+
+        hits = CounterMetricFamily("cache_hits", "Cache lookups that hit.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that missed.", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Hits / lookups since the process started.", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries currently cached.", labels=["cache"])
+        for name, cache in caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_rate"] or 0)
+            size.add_metric([name], stats["size"])
+        yield from (hits, misses, ratio, size)
+
+        connections = [
+            connection for manager in managers for connection in list(manager.active_connections.values())
+        ]
+        depths = [connection.queue.qsize() for connection in connections]
+        yield GaugeMetricFamily("ws_connections", "Open WebSocket connections.", value=len(connections))
+        yield GaugeMetricFamily("ws_send_queue_messages", "Messages queued for all WebSocket clients.", value=sum(depths))
+        yield GaugeMetricFamily(
+            "ws_send_queue_max_depth", "Longest send queue of a WebSocket client.", value=max(depths, default=0)
+        )
+
+state_collector = _StateCollector()
+REGISTRY.register(state_collector)
+
+def observe_engine(name: str, engine) -> None:
+    """Exports the pool gauges of a sync Engine (for an AsyncEngine, pass its sync_engine)."""
+    with state_collector._lock:
+        state_collector.engines[name] = engine
+
+def observe_cache(name: str, cache) -> None:
+    """Exports the hit/miss counters of a TTLCache."""
+    with state_collector._lock:
+        state_collector.caches[name] = cache
+
+def observe_websockets(manager) -> None:
+    """Exports the connection count and send-queue depth of a ConnectionManager."""
+    with state_collector._lock:
+        state_collector.websocket_managers.append(manager)
+
+def _scrape_registry() -> CollectorRegistry:
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(state_collector)
+    return registry
+
+def render_latest() -> Tuple[bytes, str]:
+    """The metrics in the Prometheus text format, and its content type."""
+    return generate_latest(_scrape_registry()), CONTENT_TYPE_LATEST
+
+def route_template(scope) -> str:
+    """
+    The matched route's template with its router prefix (/api/v1/meals/{meal_id}), or
+    "unmatched". The prefix is recovered from the request path, as the route of an
+    included router may only know its own part of the template.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    try:
+        concrete = getattr(route, "path_format", template).format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope.get("path", "")
+    return path[: len(path) - len(concrete)] + template if path.endswith(concrete) else template
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting HTTP requests and timing them, labelled with the route
+    template (/api/v1/meals/{meal_id}) so that ids do not multiply the series. Requests
+    matching no route are counted under "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+def observe_celery(celery_app) -> None:
+    """
+    Times every task of `celery_app` into CELERY_TASK_DURATION, and serves the worker's
+    metrics on CELERY_METRICS_PORT (0 = not served) once the worker starts.
+    """
+    from celery import signals
+
+    started: Dict[str, float] = {}
+
+    @signals.task_prerun.connect(weak=False)
+    def _task_started(task_id=None, **kwargs) -> None:
+        started[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def _task_finished(task_id=None, task=None, state=None, **kwargs) -> None:
+        began = started.pop(task_id, None)
+        if began is not None and task is not None:
+            CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - began)
+
+    @signals.worker_init.connect(weak=False)
+    def _serve_worker_metrics(**kwargs) -> None:
+        if settings.CELERY_METRICS_PORT:
+            start_http_server(settings.CELERY_METRICS_PORT, registry=_scrape_registry())
@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import Response
+from sqlalchemy import Select, and_, tuple_
+
+# Response header carrying the cursor of the next page, when there may be one
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class Keyset:
+    """
+    Keyset (cursor) pagination of a list sorted on indexed, non-null columns ending
+    with a unique one, all ascending or all descending.
+
+    A cursor holds the sort key of the last row of a page; the next page starts right
+    after it with an index range scan, however deep it is, and is not shifted by rows
+    inserted or deleted meanwhile. Cursors are opaque to clients and only valid for
+    the list (`name`) that issued them. skip/limit paging keeps working on the same
+    order, but not combined with a cursor.
+    """
+
+    def __init__(self, name: str, *columns, descending: bool = False):
+        self.name = name
+        self.columns = columns
+        self.descending = descending
+
+    def paginate(self, query: Select, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Select:
+        """Orders `query` by the key and selects the page. Raises ValueError for an invalid cursor."""
+        query = query.order_by(*(column.desc() if self.descending else column for column in self.columns))
+        if cursor:
+            if skip:
+                raise ValueError("Use either skip or cursor, not both.")
+            query = query.where(self._after(self.decode(cursor)))
+        return query.offset(skip).limit(limit)
+
+    def _after(self, values: List[Any]):
+        first, value = self.columns[0], values[0]
+        if len(self.columns) == 1:
+            return first < value if self.descending else first > value
+        # The bound on the first column lets a single-column index drive the scan.
+        row, bound = tuple_(*self.columns), tuple_(*values)
+        return and_(first <= value, row < bound) if self.descending else and_(first >= value, row > bound)
+
+    def next_cursor(self, items: Sequence[Any], limit: int) -> Optional[str]:
+        """Cursor of the page after `items` (objects carrying the key columns), None after a partial page."""
+        if not items or len(items) < limit:
+            return None
+        last = items[-1]
+        return self.encode([getattr(last, column.key) for column in self.columns])
+
+    def encode(self, values: List[Any]) -> str:
+        raw = json.dumps({"k": self.name, "v": [str(value) for value in values]}, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if data["k"] != self.name or len(data["v"]) != len(self.columns):
+                raise ValueError
+            return [self._parse(column, raw) for column, raw in zip(self.columns, data["v"])]
+        except Exception:
+            raise ValueError("Invalid cursor.")
+
+    @staticmethod
+    def _parse(column, raw: str) -> Any:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(raw)
+        return python_type(raw)
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
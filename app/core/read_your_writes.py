@@ -0,0 +1,118 @@
+import hashlib
+import hmac
+import math
+import time
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .config import settings
+
+# Signed "until" time (epoch seconds) before which the client reads from the primary
+COOKIE_NAME = "kk_primary_until"
+
+class RequestWrites:
+    """Read-your-writes state of one HTTP request, shared with the threads it runs code in."""
+
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+        self.committed = False
+
+_current: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+def primary_required() -> bool:
+    """
+    True while the current request's client must read from the primary: it committed a
+    write within the last DB_REPLICA_STICKY_SECONDS (cookie), or during this request.
+    """
+    state = _current.get()
+    return state is not None and (state.committed or state.primary_until > time.time())
+
+def _signature(value: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"{COOKIE_NAME}={value}".encode(), hashlib.sha256).hexdigest()
+
+def encode_until(until: float) -> str:
+    value = f"{until:.3f}"
+    return f"{value}.{_signature(value)}"
+
+def decode_until(cookie_value: str) -> float:
+    """The time in a cookie value from encode_until, or 0 when it is malformed or not ours."""
+    value, _, signature = cookie_value.rpartition(".")
+    if not value or not hmac.compare_digest(signature, _signature(value)):
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+def _cookie_until(headers) -> float:
+    for name, raw in headers:
+        if name != b"cookie":
+            continue
+        try:
+            morsel = SimpleCookie(raw.decode("latin-1")).get(COOKIE_NAME)
+        except CookieError:
+            continue
+        if morsel is not None:
+            return decode_until(morsel.value)
+    return 0.0
+
+# Sessions note whether they wrote; a write counts once its transaction committed, so a
+# failed or rolled back request leaves the client on the replicas.
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _committed(session: Session) -> None:
+    if session.info.pop("wrote", False):
+        state = _current.get()
+        if state is not None:
+            state.committed = True
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a client on the primary for DB_REPLICA_STICKY_SECONDS after a request of theirs
+    committed a write, so they see it whichever API process serves their next reads.
+    The window travels in a signed cookie (COOKIE_NAME), set on the committing response.
+    Does nothing without replicas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.DATABASE_REPLICA_URLS:
+            await self.app(scope, receive, send)
+            return
+
+        state = RequestWrites(_cookie_until(scope["headers"]))
+        token = _current.set(state)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and state.committed:
+                until = time.time() + settings.DB_REPLICA_STICKY_SECONDS
+                cookie = (
+                    f"{COOKIE_NAME}={encode_until(until)}; "
+                    f"Max-Age={math.ceil(settings.DB_REPLICA_STICKY_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _current.reset(token)
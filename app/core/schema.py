@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.database import Base
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Held while the schema is checked or created, so that workers starting together on an
+# empty database create it once.
+_LOCK_KEY = "schema"
+
+class SchemaNotMigratedError(RuntimeError):
+    """The database was created by an older version and has not been migrated to this one."""
+
+def alembic_config() -> Config:
+    """The project's Alembic configuration, usable from any working directory."""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return config
+
+def current_revision(connection: Connection) -> Optional[str]:
+    return MigrationContext.configure(connection).get_current_revision()
+
+def prepare_database(engine: Engine) -> None:
+    """
+    Creates the schema of an empty database (Base.metadata.create_all, stamped with the
+    latest Alembic revision) and checks that any other is at that revision.
+
+    Raises SchemaNotMigratedError otherwise: create_all only adds missing tables, so on
+    a database an older version created it would build the new tables against the old
+    ones (e.g. serving_log_items against an unpartitioned serving_logs) and fail half-way.
+    Such a database is brought up to date with `alembic upgrade head`.
+    """
+    script = ScriptDirectory.from_config(alembic_config())
+    head = script.get_current_head()
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": _LOCK_KEY})
+        inspector = inspect(connection)
+        if not any(inspector.has_table(table) for table in Base.metadata.tables):
+            Base.metadata.create_all(bind=connection)
+            MigrationContext.configure(connection).stamp(script, head)
+            return
+        current = current_revision(connection)
+        if current != head:
+            raise SchemaNotMigratedError(
+                f"The database schema is at revision {current or 'none (created before migrations)'}, "
+                f"this version of the app needs {head}: run `alembic upgrade head` before starting it."
+            )
@@ -1,22 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with fewer or more rounds than configured are reported by needs_update and
+# rehashed at the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+# bcrypt is deliberately slow (hundreds of ms of CPU per call): every hash and verification
+# runs on this small pool, so a burst of logins queues here instead of occupying the
+# request threadpool. bcrypt releases the GIL, so threads do run in parallel.
+_password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 
 ALGORITHM = settings.ALGORITHM
 SECRET_KEY = settings.SECRET_KEY
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _password_pool.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _password_pool.submit(pwd_context.hash, password).result()
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash): the new hash is set when the stored one uses outdated parameters."""
+    return _password_pool.submit(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password for async code: awaits the pool without holding a thread."""
+    return await asyncio.wrap_future(
+        _password_pool.submit(pwd_context.verify_and_update, plain_password, hashed_password)
+    )
+
+def password_version(credential_version: int) -> str:
+    """
+    The "pv" claim of a user's tokens: their credential version, which a password change
+    advances and a rehash at login does not. Tokens issued before a change no longer match.
+    """
+    return str(credential_version)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app.sql")
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+# Response headers set on every HTTP response
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+REPEATED_STATEMENTS_HEADER = "X-DB-Repeated-Statements"
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_APP_DIR = os.path.join(_ROOT_DIR, "app") + os.sep
+_SKIPPED_FILES = (os.path.abspath(__file__), os.path.join(_APP_DIR, "core", "database.py"))
+
+_PLACEHOLDER_RE = re.compile(
+    r"%\(\w+\)s(?:::[\w\[\]]+)?"   # psycopg2 named parameter, with its cast
+    r"|\$\d+(?:::[\w\[\]]+)?"      # asyncpg positional parameter, with its cast
+    r"|'(?:[^']|'')*'"             # string literal
+    r"|\b\d+(?:\.\d+)?\b"          # number literal
+)
+_PLACEHOLDER_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_REPEATED_ROWS_RE = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more queries, or the same statement more often, than its budget allows."""
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    The statement with its parameters and literals replaced by ?, and expanded IN lists
+    and VALUES rows collapsed, so that the executions of one query in a loop compare equal.
+    """
+    normalized = _PLACEHOLDER_RE.sub("?", " ".join(statement.split()))
+    normalized = _PLACEHOLDER_LIST_RE.sub("?, ...", normalized)
+    return _REPEATED_ROWS_RE.sub(r"\1, ...", normalized)
+
+def call_site(depth: int = 3) -> str:
+    """
+    The `depth` innermost application frames outside the database layer, innermost first,
+    as "path:line in function < ...", e.g. the lookup and the loop calling it.
+    """
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename not in _SKIPPED_FILES:
+            sites.append(f"{os.path.relpath(filename, _ROOT_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " < ".join(sites) or "unknown"
+
+class QueryStats:
+    """
+    The queries of one unit of work (an HTTP request, a test block): how many, the time
+    spent in the database, and how often each statement fingerprint ran. A fingerprint
+    that runs more than `repeat_budget` times is an N+1 candidate; the call site where it
+    crossed the budget is kept.
+
+    Over `query_budget` or `repeat_budget` (0 = no limit), `action` "warn" logs once at
+    the end of the unit and "raise" fails the query that went over with QueryBudgetExceeded.
+    """
+
+    def __init__(self, *, label: str = "", query_budget: int = 0, repeat_budget: int = 0, action: str = "warn"):
+        self.label = label
+        self.query_budget = query_budget
+        self.repeat_budget = repeat_budget
+        self.action = action
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints: Counter = Counter()
+        self.repeated: Dict[str, str] = {}  # Fingerprint -> call site
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        key = fingerprint(statement)
+        self.fingerprints[key] += 1
+        if self.repeat_budget and self.fingerprints[key] == self.repeat_budget + 1:
+            self.repeated[key] = call_site()
+            if self.action == "raise":
+                raise QueryBudgetExceeded(
+                    f"{self.label}: statement ran more than {self.repeat_budget} times "
+                    f"(N+1?) at {self.repeated[key]}: {key}"
+                )
+        if self.query_budget and self.count == self.query_budget + 1 and self.action == "raise":
+            raise QueryBudgetExceeded(f"{self.label}: more than {self.query_budget} queries")
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.repeated) or bool(self.query_budget and self.count > self.query_budget)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 2),
+            "repeated": [
+                {"statement": key, "count": self.fingerprints[key], "call_site": site}
+                for key, site in self.repeated.items()
+            ],
+        }
+
+    def headers(self) -> List[tuple]:
+        return [
+            (QUERY_COUNT_HEADER.encode(), str(self.count).encode()),
+            (QUERY_TIME_HEADER.encode(), f"{self.seconds * 1000:.2f}".encode()),
+            (REPEATED_STATEMENTS_HEADER.encode(), str(len(self.repeated)).encode()),
+        ]
+
+    def finish(self) -> None:
+        """Logs the summary as JSON: at WARNING when over budget and action is "warn", else at DEBUG."""
+        if self.over_budget and self.action == "warn":
+            logger.warning("Query budget exceeded %s", json.dumps(self.summary()))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Queries %s", json.dumps(self.summary()))
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+@contextmanager
+def track_queries(
+    label: str = "",
+    *,
+    query_budget: Optional[int] = None,
+    repeat_budget: Optional[int] = None,
+    action: Optional[str] = None,
+) -> Iterator[QueryStats]:
+    """
+    Records the queries run in this context (and the threads and tasks it starts) on
+    every engine; budgets and action default to the SQL_* settings. In tests:
+
+        with track_queries("create meal", query_budget=10, action="raise") as stats:
+            meal_service.create_with_recipe(db, obj_in=meal_in, created_by_id=user_id)
+    """
+    stats = QueryStats(
+        label=label,
+        query_budget=settings.SQL_QUERY_BUDGET if query_budget is None else query_budget,
+        repeat_budget=settings.SQL_REPEATED_STATEMENT_BUDGET if repeat_budget is None else repeat_budget,
+        action=settings.SQL_BUDGET_ACTION if action is None else action,
+    )
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        stats.finish()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["query_started_at"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    if settings.SQL_SLOW_QUERY_SECONDS and elapsed >= settings.SQL_SLOW_QUERY_SECONDS:
+        _log_slow_query(statement, parameters, elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def _log_slow_query(statement: str, parameters: Any, elapsed: float) -> None:
+    record = {"ms": round(elapsed * 1000, 2), "call_site": call_site(), "statement": " ".join(statement.split())}
+    if settings.SQL_SLOW_QUERY_LOG_PARAMETERS:
+        record["parameters"] = repr(parameters)[:1000]
+    slow_query_logger.warning("Slow query %s", json.dumps(record))
+
+def instrument_engines() -> None:
+    """Times every query of every engine (sync, async, replicas) for the slow-query log and QueryStats."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware tracking the queries of each HTTP request: adds the X-DB-* headers to
+    the response and logs requests over their budget (see QueryStats). Budgets are the
+    SQL_* settings; set SQL_BUDGET_ACTION to "raise" in tests to fail on regressions.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SQL_INSTRUMENTATION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(f"{scope['method']} {scope['path']}") as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []), *stats.headers()]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
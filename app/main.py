@@ -1,20 +1,53 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import auth, users, ingredients, meals, serving, estimates, reports, alerts, logs, recipe_items
 from app.ws import inventory as ws_inventory
+from app.ws.events import event_bus
+from app.services.log_stream import log_stream_hub
+from app.services.serving_partition import serving_partition_service
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_latest
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.read_your_writes import ReadYourWritesMiddleware
+from app.core.sql_instrumentation import (
+    QUERY_COUNT_HEADER,
+    QUERY_TIME_HEADER,
+    REPEATED_STATEMENTS_HEADER,
+    QueryStatsMiddleware,
+)
 from app.tasks.worker import celery_app
-from app.core.database import engine, Base
+from app.core.database import async_engine, engine, replica_router
+from app.core.schema import prepare_database
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Subscribes this worker to the WebSocket broadcast backend (Redis pub/sub when configured)
+    await ws_inventory.manager.start()
+    # Lets sync service code push events (inventory, alerts, serves, estimates) to WebSocket clients
+    await event_bus.start()
+    yield
+    await log_stream_hub.stop()
+    await event_bus.stop()
+    await ws_inventory.manager.stop()
+    # Closes the asyncpg connections on the loop that opened them
+    await async_engine.dispose()
+    await replica_router.dispose_async()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Kindergarten Kitchen Management API",
     description="Backend API for Kindergarten Kitchen Management System",
     version="1.0.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
-# Create the database tables
-Base.metadata.create_all(bind=engine)
+# Creates the tables of an empty database; refuses to start on one that needs `alembic upgrade head`
+prepare_database(engine)
+# Serving log partitions of the coming months, also kept ahead by Celery beat
+with engine.begin() as connection:
+    serving_partition_service.ensure_partitions(connection)
 
 
 app.add_middleware(
@@ -23,14 +56,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, QUERY_COUNT_HEADER, QUERY_TIME_HEADER, REPEATED_STATEMENTS_HEADER],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # API Routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 app.include_router(ingredients.router, prefix=f"{settings.API_V1_STR}/ingredients", tags=["ingredients"])
-app.include_router(meals.router, prefix=f"{settings.API_V1_STR}/meals", tags=["meals"])
+# Serving first: its GET /meals/serve would otherwise be taken for GET /meals/{meal_id}
 app.include_router(serving.router, prefix=f"{settings.API_V1_STR}/meals", tags=["serving"]) # Note: serving is under /meals/{meal_id}/serve
+app.include_router(meals.router, prefix=f"{settings.API_V1_STR}/meals", tags=["meals"])
 app.include_router(estimates.router, prefix=f"{settings.API_V1_STR}/estimates", tags=["estimates"])
 app.include_router(reports.router, prefix=f"{settings.API_V1_STR}/reports", tags=["reports"])
 app.include_router(alerts.router, prefix=f"{settings.API_V1_STR}/alerts", tags=["alerts"])
@@ -49,6 +87,12 @@ def read_root():
         "redoc_url": "/redoc"
     }
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        body, content_type = render_latest()
+        return Response(content=body, media_type=content_type)
+
 # Make Celery app available for import elsewhere if needed
 celery_app_instance = celery_app
 
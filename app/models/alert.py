@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.core.database import Base
+
+class AlertType(PyEnum):
+    LOW_STOCK = "low_stock"
+    DISCREPANCY = "discrepancy"
+
+class AlertStatus(PyEnum):
+    ACTIVE = "active"
+    ACKNOWLEDGED = "acknowledged"
+    RESOLVED = "resolved"
+
+class Alert(Base):
+    __tablename__ = "alerts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    type = Column(Enum(AlertType), nullable=False)
+    status = Column(Enum(AlertStatus), nullable=False, default=AlertStatus.ACTIVE)
+    # What the alert is about, e.g. "low_stock:<ingredient id>" or "discrepancy:2024-05".
+    # At most one unresolved alert exists per key (see ix_alerts_open_key).
+    key = Column(String(100), nullable=False)
+    ingredient_id = Column(UUID(as_uuid=True), ForeignKey("ingredients.id", ondelete="CASCADE"), nullable=True, index=True)
+    message = Column(String, nullable=False)
+    details = Column(JSONB, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    acknowledged_at = Column(DateTime, nullable=True)
+    acknowledged_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+    resolved_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)  # NULL when cleared automatically
+
+    __table_args__ = (
+        Index(
+            "ix_alerts_open_key", "key",
+            unique=True,
+            postgresql_where=(status != AlertStatus.RESOLVED),
+        ),
+        # GET /alerts lists open alerts (the default) or one status, newest first.
+        Index("ix_alerts_open_created_at", "created_at", postgresql_where=(status != AlertStatus.RESOLVED)),
+        Index("ix_alerts_status_created_at", "status", "created_at"),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+# Consumption rollups, maintained at serve time (see app/services/rollup.py) so that
+# reports cost O(days x entities) instead of O(servings).
+
+class DailyMealServing(Base):
+    __tablename__ = "daily_meal_servings"
+
+    day = Column(Date, primary_key=True)
+    meal_id = Column(UUID(as_uuid=True), ForeignKey("meals.id"), primary_key=True, index=True)
+    portions = Column(BigInteger, nullable=False, default=0)
+    servings = Column(Integer, nullable=False, default=0)  # Number of serving logs
+
+class DailyIngredientUsage(Base):
+    __tablename__ = "daily_ingredient_usage"
+
+    day = Column(Date, primary_key=True)
+    ingredient_id = Column(UUID(as_uuid=True), ForeignKey("ingredients.id"), primary_key=True, index=True)
+    used_grams = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, BigInteger, Sequence
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+# Every write to meal_estimates takes a fresh value, so a row's version only ever grows.
+estimate_version_seq = Sequence("meal_estimate_version_seq", metadata=Base.metadata)
+
+class MealEstimate(Base):
+    __tablename__ = "meal_estimates"
+
+    meal_id = Column(UUID(as_uuid=True), ForeignKey("meals.id", ondelete="CASCADE"), primary_key=True)
+    max_portions_possible = Column(Integer, nullable=False, default=0)
+    version = Column(BigInteger, nullable=False, index=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+class MealEstimateStoreVersion(Base):
+    """
+    One row (id 1) holding the version drawn by the last removal of stored estimates.
+    Removed rows take their versions with them, so the store version reported to clients
+    is the greater of this and the highest remaining row version.
+    """
+    __tablename__ = "meal_estimate_store_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    deleted_version = Column(BigInteger, nullable=False)
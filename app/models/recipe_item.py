@@ -8,8 +8,9 @@ class RecipeItem(Base):
     __tablename__ = "recipe_items"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    meal_id = Column(UUID(as_uuid=True), ForeignKey("meals.id"), nullable=False)
-    ingredient_id = Column(UUID(as_uuid=True), ForeignKey("ingredients.id"), nullable=False)
+    meal_id = Column(UUID(as_uuid=True), ForeignKey("meals.id"), nullable=False, index=True)
+    # Indexed: ingredient_id -> meals is the inverted index used to refresh only affected estimates
+    ingredient_id = Column(UUID(as_uuid=True), ForeignKey("ingredients.id"), nullable=False, index=True)
     amount_grams = Column(Integer, nullable=False)
 
     # Relationships
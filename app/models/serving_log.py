@@ -1,20 +1,49 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, DateTime, ForeignKey, ForeignKeyConstraint, Index, Integer, BigInteger, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.services.serving_partition import serving_partition_service
+
+# Both tables are partitioned by month on served_at (see app/services/serving_partition.py),
+# which is why it is part of their primary keys.
 
 class ServingLog(Base):
     __tablename__ = "serving_logs"
+    __table_args__ = (
+        Index("ix_serving_logs_meal_id_served_at", "meal_id", "served_at"),
+        {"postgresql_partition_by": "RANGE (served_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     meal_id = Column(UUID(as_uuid=True), ForeignKey("meals.id"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    served_at = Column(DateTime, default=datetime.now())
+    served_at = Column(DateTime, primary_key=True, default=datetime.now, index=True)
     portions = Column(Integer, nullable=False)
 
     # Relationships
     meal = relationship("Meal", back_populates="serving_logs")
     user = relationship("User", back_populates="servings_logged")
 
+class ServingLogItem(Base):
+    """Grams of one ingredient actually consumed by a serving, recorded at serve time."""
+    __tablename__ = "serving_log_items"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["serving_log_id", "served_at"], ["serving_logs.id", "serving_logs.served_at"], ondelete="CASCADE"
+        ),
+        {"postgresql_partition_by": "RANGE (served_at)"},
+    )
+
+    serving_log_id = Column(UUID(as_uuid=True), primary_key=True)
+    ingredient_id = Column(UUID(as_uuid=True), ForeignKey("ingredients.id"), primary_key=True)
+    grams = Column(BigInteger, nullable=False)
+    served_at = Column(DateTime, primary_key=True, index=True) # Copied from the serving log for range aggregates
+
+def _create_partitions(table, connection, **kw) -> None:
+    # A freshly created table needs partitions before the first insert.
+    serving_partition_service.ensure_partitions(connection, tables=[table.name])
+
+event.listen(ServingLog.__table__, "after_create", _create_partitions)
+event.listen(ServingLogItem.__table__, "after_create", _create_partitions)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -19,6 +19,8 @@ class User(Base):
     email = Column(String(100), unique=True, index=True, nullable=False)
     role = Column(Enum(UserRole), nullable=False)
     password_hash = Column(String, nullable=False)
+    # Advanced by password changes only (not by rehashing): tokens carry it, see security.password_version
+    credential_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.now)
 
     # Relationships
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, UUID4
 from typing import List, Optional
 
 # --- Report Schemas ---
@@ -17,16 +19,30 @@ class MonthlySummaryReport(BaseModel):
 
 # --- Alert Schemas ---
 
+class AlertType(str, Enum):
+    LOW_STOCK = "low_stock"
+    DISCREPANCY = "discrepancy"
+
+class AlertStatus(str, Enum):
+    ACTIVE = "active"
+    ACKNOWLEDGED = "acknowledged"
+    RESOLVED = "resolved"
+
 class AlertBase(BaseModel):
-    type: str # e.g., "low_stock", "discrepancy"
+    type: AlertType # low_stock or discrepancy
     message: str
     details: Optional[dict] = None # For additional context, e.g., ingredient_id for low_stock
 
 class Alert(AlertBase):
-    id: str # Could be a hash of the alert content or a UUID if stored
-    created_at: str # ISO datetime string
+    id: UUID4
+    status: AlertStatus
+    created_at: datetime
+    acknowledged_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 # Response for GET /api/alerts
 class ActiveAlertsResponse(BaseModel):
     alerts: List[Alert]
-
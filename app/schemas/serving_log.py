@@ -1,6 +1,7 @@
 from pydantic import BaseModel, UUID4
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
 
 # --- ServingLog Schemas ---
 class ServingLogBase(BaseModel):
@@ -20,7 +21,7 @@ class ServingLogInDBBase(ServingLogBase):
     served_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class ServingLog(ServingLogInDBBase):
     pass
@@ -32,3 +33,33 @@ class ServeMealRequest(BaseModel):
                      # For now, I will keep it as per spec. It could be the ID of the cook performing the action.
     portions: int
 
+# --- Stock shortage details, reported when a serve cannot be covered by inventory ---
+class IngredientShortage(BaseModel):
+    ingredient_id: UUID4
+    ingredient_name: str
+    required_grams: int
+    available_grams: int
+
+# --- Request/Response Schemas for POST /api/meals/serve-batch ---
+class ServeBatchMode(str, Enum):
+    ALL_OR_NOTHING = "all_or_nothing"  # Any rejected item aborts the whole batch
+    BEST_EFFORT = "best_effort"        # Serve what the inventory covers, report the rest
+
+class ServeBatchItem(BaseModel):
+    meal_id: UUID4
+    portions: int
+
+class ServeBatchRequest(BaseModel):
+    user_id: UUID4 # Same meaning as ServeMealRequest.user_id
+    items: List[ServeBatchItem]
+    mode: ServeBatchMode = ServeBatchMode.ALL_OR_NOTHING
+
+class ServeBatchRejection(BaseModel):
+    meal_id: UUID4
+    portions: int
+    reason: str
+    shortages: List[IngredientShortage] = []
+
+class ServeBatchResponse(BaseModel):
+    served: List[ServingLog]
+    rejected: List[ServeBatchRejection]
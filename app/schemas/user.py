@@ -42,4 +42,6 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    uid: Optional[UUID4] = None  # User id
+    pv: Optional[str] = None  # Credential version, see security.password_version
 
@@ -1,73 +1,208 @@
-from datetime import datetime, date, timedelta
-from typing import List, Optional, Tuple
+from datetime import datetime
+from typing import Iterable, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import Select, exists, select, update
+from sqlalchemy.dialects.postgresql import insert
 
+from app.core.pagination import Keyset
+from app.models.alert import Alert, AlertStatus, AlertType
 from app.models.ingredient import Ingredient
-from app.models.serving_log import ServingLog
-from app.models.meal import Meal # For discrepancy calculation
-from app.schemas.report import Alert # Using the Alert schema from report.py
-from app.services.report import report_service # For monthly summary to get discrepancy
+from app.schemas.report import MonthlySummaryReport
+from app.ws.events import event_bus
+from app.ws.inventory import low_stock_alert_event
+
+# Discrepancy rate (%) above which a closed month raises an alert.
+DISCREPANCY_THRESHOLD = 10.0
 
 class AlertService:
-    def get_active_alerts(self, db: Session) -> List[Alert]:
-        alerts: List[Alert] = []
-
-        # 1. Low Stock Alerts
-        low_stock_ingredients = (
-            db.query(Ingredient)
-            .filter(Ingredient.quantity_grams <= Ingredient.low_threshold_grams)
-            .all()
+    """
+    Alerts are stored in the alerts table and kept current by the code paths that change
+    what they describe: stock deductions and ingredient updates raise and clear low-stock
+    alerts, and closing a month records its discrepancy alert. Reading them is an indexed
+    query; nothing is recomputed per request.
+    """
+
+    keyset = Keyset("alerts", Alert.created_at, Alert.id, descending=True)
+
+    def get(self, db: Session, *, alert_id: str) -> Optional[Alert]:
+        return db.query(Alert).filter(Alert.id == alert_id).first()
+
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        status: Optional[AlertStatus] = None,
+        type: Optional[AlertType] = None,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> List[Alert]:
+        """
+        Lists alerts newest first, from `skip` or after `cursor`. Without `status`, lists
+        the open (active or acknowledged) ones. Raises ValueError for an invalid cursor.
+        """
+        return db.execute(self._multi_query(status=status, type=type, skip=skip, limit=limit, cursor=cursor)).scalars().all()
+
+    async def get_multi_async(
+        self,
+        db: AsyncSession,
+        *,
+        status: Optional[AlertStatus] = None,
+        type: Optional[AlertType] = None,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> List[Alert]:
+        return (await db.execute(self._multi_query(status=status, type=type, skip=skip, limit=limit, cursor=cursor))).scalars().all()
+
+    def _multi_query(
+        self, *, status: Optional[AlertStatus], type: Optional[AlertType], skip: int, limit: int, cursor: Optional[str]
+    ) -> Select:
+        query = select(Alert)
+        if status is None:
+            query = query.where(Alert.status != AlertStatus.RESOLVED)
+        else:
+            query = query.where(Alert.status == status)
+        if type is not None:
+            query = query.where(Alert.type == type)
+        return self.keyset.paginate(query, skip=skip, limit=limit, cursor=cursor)
+
+    # --- Low stock ---
+
+    def sync_low_stock(self, db: Session, *, ingredients: Iterable[Ingredient]) -> None:
+        """
+        Raises a low-stock alert for each given ingredient at or below its threshold and
+        resolves the open alert of each one above it. Runs in the caller's transaction.
+        """
+        ingredients = list(ingredients)
+        self.raise_low_stock(db, ingredients=ingredients)
+        self.clear_low_stock(
+            db,
+            ingredient_ids=[ing.id for ing in ingredients if ing.quantity_grams > ing.low_threshold_grams],
         )
-        for ing in low_stock_ingredients:
-            alerts.append(
-                Alert(
-                    id=f"low_stock_{ing.id}",
-                    type="low_stock",
-                    message=f"Ingredient 	'{ing.name}	' is low in stock ({ing.quantity_grams}g remaining, threshold is {ing.low_threshold_grams}g).",
-                    details={"ingredient_id": str(ing.id), "ingredient_name": ing.name, "current_quantity": ing.quantity_grams, "threshold": ing.low_threshold_grams},
-                    created_at=datetime.utcnow().isoformat()
-                )
-            )
-
-        # 2. Discrepancy Alert (>10%)
-        # This requires calculating the monthly summary for the *current* month up to today, or the *last completed* month.
-        # The spec says "Monthly Report: On 1st of each month, calculate discrepancy and push alert if >10%."
-        # This implies the alert is based on the *previous* month's full summary.
-        # Let's assume the alert endpoint shows if the *last calculated* monthly discrepancy (e.g., from a background task) was >10%.
-        # For now, let's calculate for the *previous* full month.
-        today = date.today()
-        first_day_current_month = today.replace(day=1)
-        last_day_previous_month = first_day_current_month - timedelta(days=1)
-        prev_month_year = last_day_previous_month.year
-        prev_month_month = last_day_previous_month.month
-
-        # Check if we are past the 1st of the month to have a previous month's report
-        # Or, if it's the first day, the report for the month before that might be relevant.
-        # For simplicity, we always check the previous full month's summary.
-        try:
-            previous_month_summary = report_service.get_monthly_summary(db, year=prev_month_year, month=prev_month_month)
-            if previous_month_summary.discrepancy_rate > 10.0:
-                alerts.append(
-                    Alert(
-                        id=f"discrepancy_{prev_month_year}_{prev_month_month}",
-                        type="discrepancy",
-                        message=f"Monthly discrepancy for {prev_month_year}-{prev_month_month:02d} is {previous_month_summary.discrepancy_rate}%, which is above the 10% threshold.",
-                        details={
-                            "month": f"{prev_month_year}-{prev_month_month:02d}", 
-                            "discrepancy_rate": previous_month_summary.discrepancy_rate,
-                            "portions_served": previous_month_summary.portions_served,
-                            "portions_possible": previous_month_summary.portions_possible
-                        },
-                        created_at=datetime.now().isoformat() # Ideally, this would be when the alert was generated
-                    )
-                )
-        except Exception as e:
-            # Could log this error, e.g., if previous month data is not available yet
-            print(f"Could not calculate discrepancy for alert: {e}")
-            pass # Don't let this crash the alert fetching
-            
-        return alerts
 
-alert_service = AlertService()
+    def raise_low_stock(self, db: Session, *, ingredients: Iterable[Ingredient]) -> None:
+        """
+        Raises a low-stock alert for each given ingredient at or below its threshold, unless
+        one is already open for it (an acknowledged alert stays acknowledged). Newly raised
+        alerts are pushed to WebSocket clients (alerts.low_stock) once the caller commits.
+        Runs in the caller's transaction and does not commit.
+        """
+        rows = [
+            {
+                "type": AlertType.LOW_STOCK,
+                "status": AlertStatus.ACTIVE,
+                "key": f"low_stock:{ing.id}",
+                "ingredient_id": ing.id,
+                "message": (
+                    f"Ingredient '{ing.name}' is low in stock "
+                    f"({ing.quantity_grams}g remaining, threshold is {ing.low_threshold_grams}g)."
+                ),
+                "details": {
+                    "ingredient_id": str(ing.id),
+                    "ingredient_name": ing.name,
+                    "current_quantity": ing.quantity_grams,
+                    "threshold": ing.low_threshold_grams,
+                },
+                "created_at": datetime.now(),
+            }
+            # Key order keeps concurrent deductions locking index entries in the same order.
+            for ing in sorted(ingredients, key=lambda ing: ing.id)
+            if ing.quantity_grams <= ing.low_threshold_grams
+        ]
+        if not rows:
+            return
+        stmt = insert(Alert).values(rows).on_conflict_do_nothing(
+            index_elements=[Alert.key],
+            index_where=Alert.status != AlertStatus.RESOLVED,
+        ).returning(Alert.details)
+        for details in db.execute(stmt).scalars():
+            event_bus.publish_after_commit(db, low_stock_alert_event(
+                details["ingredient_id"], details["ingredient_name"], details["current_quantity"], details["threshold"]
+            ))
 
+    def clear_low_stock(self, db: Session, *, ingredient_ids: Iterable) -> None:
+        """Resolves the open low-stock alerts of the given ingredients. Does not commit."""
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+        db.execute(
+            update(Alert)
+            .where(Alert.type == AlertType.LOW_STOCK)
+            .where(Alert.ingredient_id.in_(ingredient_ids))
+            .where(Alert.status != AlertStatus.RESOLVED)
+            .values(status=AlertStatus.RESOLVED, resolved_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    # --- Monthly discrepancy ---
+
+    def record_discrepancy(
+        self, db: Session, *, year: int, month: int, summary: MonthlySummaryReport
+    ) -> bool:
+        """
+        Records the discrepancy alert of a closed month if its rate is above the threshold.
+        A month gets at most one alert, even if its report is generated again after the
+        alert was resolved. Does not commit; returns whether an alert was written.
+        """
+        if summary.discrepancy_rate <= DISCREPANCY_THRESHOLD:
+            return False
+        period = f"{year}-{month:02d}"
+        key = f"discrepancy:{period}"
+        if db.query(exists().where(Alert.key == key)).scalar():
+            return False
+        # A concurrent close of the same month loses on ix_alerts_open_key and writes nothing.
+        result = db.execute(insert(Alert).values(
+            type=AlertType.DISCREPANCY,
+            status=AlertStatus.ACTIVE,
+            key=key,
+            message=(
+                f"Monthly discrepancy for {period} is {summary.discrepancy_rate}%, "
+                f"which is above the {DISCREPANCY_THRESHOLD:g}% threshold."
+            ),
+            details={
+                "month": period,
+                "discrepancy_rate": summary.discrepancy_rate,
+                "portions_served": summary.portions_served,
+                "portions_possible": summary.portions_possible,
+            },
+            created_at=datetime.now(),
+        ).on_conflict_do_nothing(
+            index_elements=[Alert.key],
+            index_where=Alert.status != AlertStatus.RESOLVED,
+        ))
+        return result.rowcount > 0
+
+    # --- Acknowledge / resolve ---
+
+    def acknowledge(self, db: Session, *, alert: Alert, user_id) -> Alert:
+        # Re-read under a row lock so an automatic clear cannot be overwritten.
+        db.refresh(alert, with_for_update=True)
+        if alert.status == AlertStatus.RESOLVED:
+            raise ValueError("Alert is already resolved.")
+        if alert.status == AlertStatus.ACTIVE:
+            alert.status = AlertStatus.ACKNOWLEDGED
+            alert.acknowledged_at = datetime.now()
+            alert.acknowledged_by_id = user_id
+            db.add(alert)
+            db.commit()
+            db.refresh(alert)
+        return alert
+
+    def resolve(self, db: Session, *, alert: Alert, user_id) -> Alert:
+        """
+        Resolves an alert. A low-stock alert resolved while the ingredient is still low is
+        raised again by the next deduction; acknowledge it to silence it instead.
+        """
+        db.refresh(alert, with_for_update=True)
+        if alert.status != AlertStatus.RESOLVED:
+            alert.status = AlertStatus.RESOLVED
+            alert.resolved_at = datetime.now()
+            alert.resolved_by_id = user_id
+            db.add(alert)
+            db.commit()
+            db.refresh(alert)
+        return alert
+
+alert_service = AlertService()
@@ -1,57 +1,250 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, literal_column
-from sqlalchemy.sql.expression import select, and_
+from sqlalchemy import Select, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models.meal import Meal
+from app.models.meal_estimate import (
+    MealEstimate as MealEstimateModel, MealEstimateStoreVersion, estimate_version_seq,
+)
 from app.models.recipe_item import RecipeItem
 from app.models.ingredient import Ingredient
 from app.schemas.estimate import MealEstimate
+from app.ws.events import event_bus
+from app.ws.inventory import estimate_update_event
+
+
+class RecipeMatrix:
+    """
+    Sparse meal x ingredient matrix of recipe amounts (grams per portion).
+
+    Stored row-wise like a CSR matrix: every meal maps to two parallel lists holding the
+    column (ingredient) indexes and the amounts of its recipe items. Loaded with one query
+    over recipe_items, so estimating any number of meals costs a fixed number of queries.
+    """
+
+    def __init__(self, meal_names: Dict[UUID, str], recipe_rows: Iterable):
+        self.meal_names = meal_names
+        self.ingredient_ids: List[UUID] = []  # column index -> ingredient id
+        self.columns: Dict[UUID, int] = {}    # ingredient id -> column index
+        self.rows: Dict[UUID, tuple] = {meal_id: ([], []) for meal_id in meal_names}
+
+        for meal_id, ingredient_id, amount_grams in recipe_rows:
+            column = self.columns.get(ingredient_id)
+            if column is None:
+                column = self.columns[ingredient_id] = len(self.ingredient_ids)
+                self.ingredient_ids.append(ingredient_id)
+            indexes, amounts = self.rows.setdefault(meal_id, ([], []))
+            indexes.append(column)
+            amounts.append(amount_grams)
+
+    @classmethod
+    def load(cls, db: Session, *, meal_ids: Optional[Iterable] = None) -> "RecipeMatrix":
+        """Loads the matrix for all meals, or only for `meal_ids`."""
+        meals_query = select(Meal.id, Meal.name).order_by(Meal.name)
+        recipe_query = select(RecipeItem.meal_id, RecipeItem.ingredient_id, RecipeItem.amount_grams)
+        if meal_ids is not None:
+            meal_ids = list(meal_ids)
+            meals_query = meals_query.where(Meal.id.in_(meal_ids))
+            recipe_query = recipe_query.where(RecipeItem.meal_id.in_(meal_ids))
+
+        meal_names = {meal_id: name for meal_id, name in db.execute(meals_query)}
+        return cls(meal_names, db.execute(recipe_query))
+
+    def inventory_vector(self, inventory: Dict[UUID, int]) -> List[Optional[int]]:
+        """Lays out `inventory` (ingredient_id -> grams) along the matrix columns; None marks a missing ingredient."""
+        return [inventory.get(ingredient_id) for ingredient_id in self.ingredient_ids]
+
+    def max_portions(self, inventory: Dict[UUID, int]) -> Dict[UUID, int]:
+        """
+        Computes max portions for every meal: per row, floor-divide the gathered inventory
+        by the recipe amounts and min-reduce. Matches the original per-item rules: a meal
+        without recipe, with a missing ingredient or a zero amount cannot be served (0).
+        """
+        vector = self.inventory_vector(inventory)
+        results: Dict[UUID, int] = {}
+        for meal_id, (indexes, amounts) in self.rows.items():
+            results[meal_id] = self._reduce_row([vector[i] for i in indexes], amounts)
+        return results
+
+    @staticmethod
+    def _reduce_row(quantities: List[Optional[int]], amounts: List[int]) -> int:
+        if not amounts or None in quantities or 0 in amounts:
+            return 0
+        min_portions = None  # None stands for "unbounded"
+        for quantity, amount in zip(quantities, amounts):
+            if amount > 0:
+                portions = quantity // amount
+            elif quantity == 0:
+                # Negative amount and nothing in stock never limits the meal.
+                continue
+            else:
+                portions = 0
+            if min_portions is None or portions < min_portions:
+                min_portions = portions
+        # An unbounded meal (no limiting ingredient) is reported as 0, as before.
+        return 0 if min_portions is None else int(min_portions)
+
 
 class EstimateService:
+    def load_inventory(self, db: Session, *, ingredient_ids: Optional[Iterable] = None) -> Dict[UUID, int]:
+        """Loads current stock as an ingredient_id -> grams vector in one query."""
+        query = select(Ingredient.id, Ingredient.quantity_grams)
+        if ingredient_ids is not None:
+            query = query.where(Ingredient.id.in_(list(ingredient_ids)))
+        return {ingredient_id: quantity for ingredient_id, quantity in db.execute(query)}
+
     def calculate_max_portions_for_all_meals(self, db: Session) -> List[MealEstimate]:
         """
         Calculates the maximum portions possible for each meal based on current inventory.
-        Formula: min(ingredient.quantity_grams / recipe_item.amount_grams) for each meal.
+        Formula: min(ingredient.quantity_grams // recipe_item.amount_grams) for each meal.
         """
-        results = []
-        meals = db.query(Meal).all()
+        return self._calculate(db)
 
-        for meal in meals:
-            if not meal.recipe_items:
-                results.append(MealEstimate(meal_id=meal.id, meal_name=meal.name, max_portions_possible=0))
-                continue
+    def _calculate(self, db: Session, *, meal_ids: Optional[Iterable] = None) -> List[MealEstimate]:
+        matrix = RecipeMatrix.load(db, meal_ids=meal_ids)
+        inventory = self.load_inventory(db, ingredient_ids=None if meal_ids is None else matrix.ingredient_ids)
+        max_portions = matrix.max_portions(inventory)
+        return [
+            MealEstimate(meal_id=meal_id, meal_name=meal_name, max_portions_possible=max_portions[meal_id])
+            for meal_id, meal_name in matrix.meal_names.items()
+        ]
 
-            min_portions_for_meal = float("inf")
-            possible_for_all_ingredients = True
-
-            for item in meal.recipe_items:
-                ingredient = db.query(Ingredient).filter(Ingredient.id == item.ingredient_id).first()
-                if not ingredient or item.amount_grams == 0: # Should not happen with proper data
-                    possible_for_all_ingredients = False
-                    break
-                
-                # If ingredient quantity is 0, but amount_grams is also 0 (e.g. water, salt - not in spec but general case)
-                # this would be infinite. For this spec, amount_grams > 0 is implied.
-                if ingredient.quantity_grams == 0 and item.amount_grams > 0:
-                    portions_for_this_ingredient = 0
-                elif item.amount_grams > 0: # Avoid division by zero
-                    portions_for_this_ingredient = ingredient.quantity_grams // item.amount_grams
-                else: # amount_grams is 0 or negative, treat as infinite if quantity is also 0, else 0
-                    portions_for_this_ingredient = float("inf") if ingredient.quantity_grams == 0 else 0
-
-                min_portions_for_meal = min(min_portions_for_meal, portions_for_this_ingredient)
-            
-            if not possible_for_all_ingredients:
-                max_p = 0
-            elif min_portions_for_meal == float("inf"): # Happens if all ingredients have 0 amount_grams and 0 quantity
-                max_p = 0 # Or some other indicator of an issue / undefined state
-            else:
-                max_p = int(min_portions_for_meal)
+    # --- Maintained estimate store (meal_estimates table) ---
 
-            results.append(MealEstimate(meal_id=meal.id, meal_name=meal.name, max_portions_possible=max_p))
-        
-        return results
+    def _store(self, db: Session, estimates: List[MealEstimate]) -> None:
+        if not estimates:
+            return
+        stmt = insert(MealEstimateModel).values([
+            {
+                "meal_id": est.meal_id,
+                "max_portions_possible": est.max_portions_possible,
+                "version": estimate_version_seq.next_value(),
+            }
+            # Upsert in key order so concurrent refreshes lock rows in the same order.
+            for est in sorted(estimates, key=lambda est: est.meal_id)
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[MealEstimateModel.meal_id],
+            set_={
+                "max_portions_possible": stmt.excluded.max_portions_possible,
+                "version": stmt.excluded.version,
+                "updated_at": func.now(),
+            },
+        ))
+        for est in estimates:
+            event_bus.publish_after_commit(db, estimate_update_event(est.meal_id, est.max_portions_possible))
 
-estimate_service = EstimateService()
+    def record_removal(self, db: Session) -> None:
+        """
+        Advances the store version after stored estimates were removed (e.g. with their
+        meal), which the remaining rows' versions cannot reflect. Does not commit.
+        """
+        stmt = insert(MealEstimateStoreVersion).values(id=1, deleted_version=estimate_version_seq.next_value())
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[MealEstimateStoreVersion.id],
+            set_={"deleted_version": stmt.excluded.deleted_version},
+        ))
+
+    def refresh_meals(self, db: Session, *, meal_ids: Iterable) -> None:
+        """
+        Recomputes and stores the estimates of the given meals, e.g. after a recipe edit.
+        Runs in the caller's transaction and does not commit.
+        """
+        meal_ids = sorted({UUID(str(meal_id)) for meal_id in meal_ids})
+        if not meal_ids:
+            return
+        db.flush()
+        # Lock the stored rows before reading inventory: a concurrent refresh of the same
+        # meal then waits for our commit and recomputes from stock that includes our change,
+        # instead of overwriting the estimate with a value computed from older stock.
+        db.execute(
+            select(MealEstimateModel.meal_id)
+            .where(MealEstimateModel.meal_id.in_(meal_ids))
+            .order_by(MealEstimateModel.meal_id)
+            .with_for_update()
+        )
+        self._store(db, self._calculate(db, meal_ids=meal_ids))
+
+    def refresh_for_ingredients(self, db: Session, *, ingredient_ids: Iterable) -> None:
+        """
+        Recomputes and stores only the estimates of meals whose recipe uses one of the
+        given ingredients (looked up through the recipe_items.ingredient_id index).
+        Runs in the caller's transaction and does not commit.
+        """
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+        db.flush()
+        meal_ids = db.execute(
+            select(RecipeItem.meal_id).where(RecipeItem.ingredient_id.in_(ingredient_ids)).distinct()
+        ).scalars().all()
+        self.refresh_meals(db, meal_ids=meal_ids)
 
+    def rebuild(self, db: Session) -> List[MealEstimate]:
+        """Recomputes every meal's estimate and replaces the stored ones. Does not commit."""
+        estimates = self._calculate(db)
+        removed = db.execute(delete(MealEstimateModel).where(
+            MealEstimateModel.meal_id.notin_([est.meal_id for est in estimates])
+        ))
+        if removed.rowcount:
+            self.record_removal(db)
+        self._store(db, estimates)
+        return estimates
+
+    def get_estimates(self, db: Session) -> Tuple[List[MealEstimate], int]:
+        """
+        Reads the maintained estimates and the store version with a single query (a
+        second one when there is no meal). Meals that have no stored estimate yet (created before the store existed) are
+        computed on the fly; they are persisted by the next rebuild.
+        """
+        rows = db.execute(self._stored_estimates_query()).all()
+        if not rows:
+            return [], db.execute(self._deleted_version_query()).scalar() or 0
+        missing = [row.meal_id for row in rows if row.version is None]
+        computed = self._calculate(db, meal_ids=missing) if missing else []
+        return self._merge(rows, computed)
+
+    async def get_estimates_async(self, db: AsyncSession) -> Tuple[List[MealEstimate], int]:
+        """get_estimates on an async session."""
+        rows = (await db.execute(self._stored_estimates_query())).all()
+        if not rows:
+            return [], (await db.execute(self._deleted_version_query())).scalar() or 0
+        missing = [row.meal_id for row in rows if row.version is None]
+        computed = await db.run_sync(lambda session: self._calculate(session, meal_ids=missing)) if missing else []
+        return self._merge(rows, computed)
+
+    @staticmethod
+    def _deleted_version_query() -> Select:
+        return select(MealEstimateStoreVersion.deleted_version).where(MealEstimateStoreVersion.id == 1)
+
+    @classmethod
+    def _stored_estimates_query(cls) -> Select:
+        return (
+            select(
+                Meal.id.label("meal_id"),
+                Meal.name,
+                MealEstimateModel.max_portions_possible,
+                MealEstimateModel.version,
+                cls._deleted_version_query().scalar_subquery().label("deleted_version"),
+            )
+            .outerjoin(MealEstimateModel, MealEstimateModel.meal_id == Meal.id)
+            .order_by(Meal.name)
+        )
+
+    @staticmethod
+    def _merge(rows, computed: List[MealEstimate]) -> Tuple[List[MealEstimate], int]:
+        computed = {est.meal_id: est for est in computed}
+        estimates = [
+            computed[meal_id] if version is None
+            else MealEstimate(meal_id=meal_id, meal_name=meal_name, max_portions_possible=max_portions)
+            for meal_id, meal_name, max_portions, version, _ in rows
+        ]
+        # Removed rows took their versions with them: the store version covers them.
+        versions = [row.version for row in rows if row.version is not None] + [rows[0].deleted_version or 0]
+        return estimates, max(versions)
+
+estimate_service = EstimateService()
@@ -1,24 +1,46 @@
 from typing import List, Optional
+from uuid import UUID
 
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.pagination import Keyset
 from app.models.ingredient import Ingredient
 from app.schemas.ingredient import IngredientCreate, IngredientUpdate
+from app.services.alert import alert_service
+from app.services.estimate import estimate_service
+from app.ws.events import event_bus
+from app.ws.inventory import inventory_update_event
 
 class IngredientService:
+    keyset = Keyset("ingredients", Ingredient.name)
+
     def get(self, db: Session, id: str) -> Optional[Ingredient]:
         return db.query(Ingredient).filter(Ingredient.id == id).first()
 
+    async def get_async(self, db: AsyncSession, id: str) -> Optional[Ingredient]:
+        return await db.get(Ingredient, UUID(str(id)))
+
     def get_by_name(self, db: Session, *, name: str) -> Optional[Ingredient]:
         return db.query(Ingredient).filter(Ingredient.name == name).first()
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100, search: Optional[str] = None
+        self, db: Session, *, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None
     ) -> List[Ingredient]:
-        query = db.query(Ingredient)
+        """Ingredients by name, from `skip` or after `cursor`. Raises ValueError for an invalid cursor."""
+        return db.execute(self._multi_query(skip=skip, limit=limit, search=search, cursor=cursor)).scalars().all()
+
+    async def get_multi_async(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> List[Ingredient]:
+        return (await db.execute(self._multi_query(skip=skip, limit=limit, search=search, cursor=cursor))).scalars().all()
+
+    def _multi_query(self, *, skip: int, limit: int, search: Optional[str], cursor: Optional[str]) -> Select:
+        query = select(Ingredient)
         if search:
-            query = query.filter(Ingredient.name.ilike(f"%{search}%"))
-        return query.offset(skip).limit(limit).all()
+            query = query.where(Ingredient.name.ilike(f"%{search}%"))
+        return self.keyset.paginate(query, skip=skip, limit=limit, cursor=cursor)
 
     def create(self, db: Session, *, obj_in: IngredientCreate) -> Ingredient:
         db_obj = Ingredient(
@@ -28,6 +50,9 @@ class IngredientService:
             low_threshold_grams=obj_in.low_threshold_grams
         )
         db.add(db_obj)
+        db.flush()
+        alert_service.sync_low_stock(db, ingredients=[db_obj])
+        event_bus.publish_after_commit(db, inventory_update_event(db_obj.id, db_obj.quantity_grams))
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -44,6 +69,11 @@ class IngredientService:
             setattr(db_obj, field, value)
             
         db.add(db_obj)
+        if "quantity_grams" in update_data:
+            estimate_service.refresh_for_ingredients(db, ingredient_ids=[db_obj.id])
+            event_bus.publish_after_commit(db, inventory_update_event(db_obj.id, db_obj.quantity_grams))
+        if "quantity_grams" in update_data or "low_threshold_grams" in update_data:
+            alert_service.sync_low_stock(db, ingredients=[db_obj])
         db.commit()
         db.refresh(db_obj)
         return db_obj
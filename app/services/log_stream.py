@@ -0,0 +1,199 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.logs import extract_log_level, extract_timestamp, line_matcher
+
+class LogSubscriber:
+    """One live-tail viewer: its filter and a bounded queue of matching entries."""
+
+    def __init__(self, matches: Callable[[str], bool]):
+        self.matches = matches
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.LOG_STREAM_QUEUE_SIZE)
+        self.dropped = 0  # Entries lost because the viewer fell behind, reported with the next one
+
+    def offer(self, entry: Dict[str, Any]) -> None:
+        if not self.matches(entry["message"]):
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+class LogWatcher:
+    """
+    Follows one log file by name, like `tail -F`, for every viewer of that file.
+
+    The file is polled with a stat every LOG_STREAM_POLL_SECONDS; only when it grew,
+    shrank or was replaced are the new bytes read, once, and their lines handed to all
+    subscribers. On rotation (another inode behind the name) the rest of the old file is
+    read before following the new one from its start; a truncated file is read again from
+    its start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: List[LogSubscriber] = []
+        self.task: Optional[asyncio.Task] = None
+        self.file = None
+        self.inode: Optional[int] = None
+        self.position = 0
+        self.partial = b""  # Last line, not complete yet
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open(self, from_start: bool) -> None:
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.path, "rb")
+        stat = os.fstat(self.file.fileno())
+        self.inode = stat.st_ino
+        self.position = 0 if from_start else stat.st_size
+        self.partial = b""
+
+    def _changed(self) -> bool:
+        """Cheap check run on every poll: whether there is anything to read."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False  # Between rotation and re-creation
+        return self.file is None or stat.st_ino != self.inode or stat.st_size != self.position
+
+    def _read(self) -> List[str]:
+        """Reads everything new (runs in a thread); returns the complete lines."""
+        if self.file is None:
+            # Did not exist when the watch started: all of it is new.
+            self._open(from_start=True)
+        if os.fstat(self.file.fileno()).st_size < self.position:  # Truncated in place
+            self.position, self.partial = 0, b""
+        self.file.seek(self.position)
+        data = self.file.read()
+        self.position += len(data)
+        try:
+            replaced = os.stat(self.path).st_ino != self.inode
+        except OSError:
+            replaced = False
+        if not replaced:
+            return self._split(data)
+        # Rotated: the old file is read to its end above, and its last line ends there.
+        if not data.endswith(b"\n") and (self.partial or data):
+            data += b"\n"
+        lines = self._split(data)
+        self._open(from_start=True)
+        data = self.file.read()
+        self.position = len(data)
+        return lines + self._split(data)
+
+    def _split(self, data: bytes) -> List[str]:
+        pieces = (self.partial + data).split(b"\n")
+        self.partial = pieces.pop()
+        lines = []
+        for raw in pieces:
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line:
+                lines.append(line)
+        return lines
+
+    async def run(self) -> None:
+        try:
+            self._open(from_start=False)  # Only what is written from now on
+        except OSError:
+            pass
+        while True:
+            try:
+                if self._changed():
+                    lines = await asyncio.to_thread(self._read)
+                    self._publish(lines)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Log stream error on {self.path}: {e}")
+            await asyncio.sleep(settings.LOG_STREAM_POLL_SECONDS)
+
+    def _publish(self, lines: List[str]) -> None:
+        source_file = os.path.basename(self.path)
+        for line in lines:
+            # Built once, whatever the number of viewers
+            entry = {
+                "timestamp": extract_timestamp(line),
+                "level": extract_log_level(line),
+                "source_file": source_file,
+                "message": line,
+                "file_path": self.path
+            }
+            for subscriber in self.subscribers:
+                subscriber.offer(entry)
+
+class LogStreamHub:
+    """
+    Live tail of log files shared by all viewers of this process: one LogWatcher per
+    followed file, started with its first subscriber and stopped with its last.
+    """
+
+    def __init__(self):
+        self.watchers: Dict[str, LogWatcher] = {}
+
+    def subscribe(self, paths: List[str], subscriber: LogSubscriber) -> None:
+        for path in paths:
+            key = os.path.abspath(path)
+            watcher = self.watchers.get(key)
+            if watcher is None:
+                watcher = self.watchers[key] = LogWatcher(path)
+                watcher.start()
+            watcher.subscribers.append(subscriber)
+
+    async def unsubscribe(self, subscriber: LogSubscriber) -> None:
+        for key, watcher in list(self.watchers.items()):
+            if subscriber in watcher.subscribers:
+                watcher.subscribers.remove(subscriber)
+                if not watcher.subscribers:
+                    del self.watchers[key]
+                    await watcher.stop()
+
+    async def stop(self) -> None:
+        watchers, self.watchers = self.watchers, {}
+        for watcher in watchers.values():
+            await watcher.stop()
+
+    async def follow(
+        self, paths: List[str], *, level: Optional[str] = None, search: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields entries appended to `paths` from now on that match the filters. Yields None
+        every LOG_STREAM_HEARTBEAT_SECONDS without any, so callers can send keep-alives.
+        If the viewer fell behind, the next entry carries "dropped": the number of entries
+        it missed.
+        """
+        subscriber = LogSubscriber(line_matcher(level=level, search=search))
+        self.subscribe(paths, subscriber)
+        try:
+            while True:
+                try:
+                    entry = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.LOG_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if subscriber.dropped:
+                    entry = {**entry, "dropped": subscriber.dropped}
+                    subscriber.dropped = 0
+                yield entry
+        finally:
+            await self.unsubscribe(subscriber)
+
+log_stream_hub = LogStreamHub()
@@ -1,15 +1,20 @@
 from typing import List, Optional, Tuple
+from uuid import UUID
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import Select, func, select
 
+from app.core.pagination import Keyset
 from app.models.meal import Meal
 from app.models.recipe_item import RecipeItem
 from app.models.ingredient import Ingredient # Needed for validation
 from app.schemas.meal import MealCreate, MealUpdate, RecipeItemCreate
-from app.services.ingredient import ingredient_service # To check ingredient existence
+from app.services.estimate import estimate_service
 
 class MealService:
+    keyset = Keyset("meals", Meal.name)
+
     def get(self, db: Session, id: str) -> Optional[Meal]:
         return db.query(Meal).filter(Meal.id == id).first()
 
@@ -17,9 +22,23 @@ class MealService:
         return db.query(Meal).filter(Meal.name == name).first()
 
     def get_multi_with_summary(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[Tuple[Meal, int, int]]:
+        """Fetches meals by name, from `skip` or after `cursor`, along with recipe ingredient count and total grams."""
+        return db.execute(self._summary_query(skip=skip, limit=limit, cursor=cursor)).all()
+
+    async def get_multi_with_summary_async(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
     ) -> List[Tuple[Meal, int, int]]:
-        """Fetches meals along with recipe ingredient count and total grams."""
+        return (await db.execute(self._summary_query(skip=skip, limit=limit, cursor=cursor))).all()
+
+    async def get_with_recipe_async(self, db: AsyncSession, id: str) -> Optional[Meal]:
+        """The meal with its recipe items loaded (async sessions cannot lazy-load them)."""
+        return (await db.execute(
+            select(Meal).options(selectinload(Meal.recipe_items)).where(Meal.id == UUID(str(id)))
+        )).scalars().first()
+
+    def _summary_query(self, *, skip: int, limit: int, cursor: Optional[str]) -> Select:
         # Subquery to count recipe items per meal
         recipe_item_count_sq = (
             select(RecipeItem.meal_id, func.count(RecipeItem.id).label("item_count"))
@@ -34,25 +53,21 @@ class MealService:
         )
 
         query = (
-            db.query(
+            select(
                 Meal,
                 func.coalesce(recipe_item_count_sq.c.item_count, 0).label("recipe_ingredient_count"),
                 func.coalesce(recipe_total_grams_sq.c.total_grams, 0).label("recipe_total_grams")
             )
             .outerjoin(recipe_item_count_sq, Meal.id == recipe_item_count_sq.c.meal_id)
             .outerjoin(recipe_total_grams_sq, Meal.id == recipe_total_grams_sq.c.meal_id)
-            .order_by(Meal.name)
-            .offset(skip)
-            .limit(limit)
         )
-        return query.all()
+        return self.keyset.paginate(query, skip=skip, limit=limit, cursor=cursor)
 
     def create_with_recipe(self, db: Session, *, obj_in: MealCreate, created_by_id: str) -> Meal:
         # Validate all ingredients in the recipe exist
-        for item_in in obj_in.recipe:
-            ingredient = ingredient_service.get(db, id=str(item_in.ingredient_id))
-            if not ingredient:
-                raise ValueError(f"Ingredient with id {item_in.ingredient_id} not found.")
+        missing = self._missing_ingredient_id(db, obj_in.recipe)
+        if missing:
+            raise ValueError(f"Ingredient with id {missing} not found.")
 
         db_meal = Meal(name=obj_in.name, created_by_id=created_by_id)
         db.add(db_meal)
@@ -66,6 +81,7 @@ class MealService:
             )
             db.add(db_recipe_item)
         
+        estimate_service.refresh_meals(db, meal_ids=[db_meal.id])
         db.commit()
         db.refresh(db_meal)
         return db_meal
@@ -79,27 +95,37 @@ class MealService:
             db.query(RecipeItem).filter(RecipeItem.meal_id == db_obj.id).delete()
 
             # Validate and add new recipe items
+            missing = self._missing_ingredient_id(db, obj_in.recipe)
+            if missing:
+                raise ValueError(f"Ingredient with id {missing} not found during update.")
             for item_in in obj_in.recipe:
-                ingredient = ingredient_service.get(db, id=str(item_in.ingredient_id))
-                if not ingredient:
-                    raise ValueError(f"Ingredient with id {item_in.ingredient_id} not found during update.")
                 db_recipe_item = RecipeItem(
                     meal_id=db_obj.id,
                     ingredient_id=item_in.ingredient_id,
                     amount_grams=item_in.amount_grams
                 )
                 db.add(db_recipe_item)
+            estimate_service.refresh_meals(db, meal_ids=[db_obj.id])
         
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    @staticmethod
+    def _missing_ingredient_id(db: Session, recipe: List[RecipeItemCreate]) -> Optional[UUID]:
+        """The first recipe ingredient that does not exist, checked in one query."""
+        ids = {item.ingredient_id for item in recipe}
+        existing = set(db.execute(select(Ingredient.id).where(Ingredient.id.in_(ids))).scalars()) if ids else set()
+        return next((item.ingredient_id for item in recipe if item.ingredient_id not in existing), None)
+
     def remove(self, db: Session, *, id: str) -> Optional[Meal]:
         obj = db.query(Meal).get(id)
         if obj:
             # RecipeItems are cascade deleted due to relationship setting in Meal model
             db.delete(obj)
+            # Its stored estimate goes too (ON DELETE CASCADE)
+            estimate_service.record_removal(db)
             db.commit()
         return obj
 
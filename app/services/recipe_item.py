@@ -1,15 +1,19 @@
 from typing import Any, Dict, List, Optional, Union
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
+from app.core.pagination import Keyset
 from app.models.recipe_item import RecipeItem
 from app.models.meal import Meal
 from app.models.ingredient import Ingredient
 from app.schemas.meal import RecipeItemCreate, RecipeItemUpdate
+from app.services.estimate import estimate_service
 
 
 class RecipeItemService:
+    keyset = Keyset("recipe_items", RecipeItem.id)
+
     def get(self, db: Session, id: Any) -> Optional[RecipeItem]:
         """Get a single recipe item by ID."""
         return db.query(RecipeItem).filter(RecipeItem.id == id).first()
@@ -21,18 +25,19 @@ class RecipeItemService:
             skip: int = 0,
             limit: int = 100,
             meal_id: Optional[str] = None,
-            ingredient_id: Optional[str] = None
+            ingredient_id: Optional[str] = None,
+            cursor: Optional[str] = None
     ) -> List[RecipeItem]:
-        """Get multiple recipe items with optional filtering."""
-        query = db.query(RecipeItem)
+        """Get multiple recipe items with optional filtering, from `skip` or after `cursor`."""
+        query = select(RecipeItem)
 
         if meal_id:
-            query = query.filter(RecipeItem.meal_id == meal_id)
+            query = query.where(RecipeItem.meal_id == meal_id)
 
         if ingredient_id:
-            query = query.filter(RecipeItem.ingredient_id == ingredient_id)
+            query = query.where(RecipeItem.ingredient_id == ingredient_id)
 
-        return query.offset(skip).limit(limit).all()
+        return db.execute(self.keyset.paginate(query, skip=skip, limit=limit, cursor=cursor)).scalars().all()
 
     def get_by_meal_id(self, db: Session, *, meal_id: str) -> List[RecipeItem]:
         """Get all recipe items for a specific meal."""
@@ -80,6 +85,7 @@ class RecipeItemService:
             amount_grams=obj_in.amount_grams
         )
         db.add(db_obj)
+        estimate_service.refresh_meals(db, meal_ids=[meal_id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -134,6 +140,7 @@ class RecipeItemService:
                 db.add(db_obj)
                 created_items.append(db_obj)
 
+            estimate_service.refresh_meals(db, meal_ids=[meal_id])
             db.commit()
 
             # Refresh all objects
@@ -182,6 +189,7 @@ class RecipeItemService:
             setattr(db_obj, field, value)
 
         db.add(db_obj)
+        estimate_service.refresh_meals(db, meal_ids=[db_obj.meal_id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -193,6 +201,7 @@ class RecipeItemService:
             raise ValueError(f"Recipe item with id {id} not found.")
 
         db.delete(obj)
+        estimate_service.refresh_meals(db, meal_ids=[obj.meal_id])
         db.commit()
         return obj
 
@@ -208,6 +217,7 @@ class RecipeItemService:
 
         # Delete all recipe items for the meal
         db.query(RecipeItem).filter(RecipeItem.meal_id == meal_id).delete()
+        estimate_service.refresh_meals(db, meal_ids=[meal_id])
         db.commit()
 
         return count
@@ -219,11 +229,16 @@ class RecipeItemService:
         if not ingredient:
             raise ValueError(f"Ingredient with id {ingredient_id} not found.")
 
-        # Count items before deletion
+        # Collect affected meals before deletion
+        meal_ids = [
+            meal_id for (meal_id,) in
+            db.query(RecipeItem.meal_id).filter(RecipeItem.ingredient_id == ingredient_id).distinct()
+        ]
         count = db.query(RecipeItem).filter(RecipeItem.ingredient_id == ingredient_id).count()
 
         # Delete all recipe items using this ingredient
         db.query(RecipeItem).filter(RecipeItem.ingredient_id == ingredient_id).delete()
+        estimate_service.refresh_meals(db, meal_ids=meal_ids)
         db.commit()
 
         return count
@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+from sqlalchemy import cast, delete, func, select, text, Date
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.daily_rollup import DailyMealServing, DailyIngredientUsage
+from app.models.serving_log import ServingLog, ServingLogItem
+from app.services.serving_partition import serving_partition_service
+
+
+# Taken by rebuild: conflicts with the ROW EXCLUSIVE lock of the serves' upserts, so a
+# rebuild waits for the serves that already counted theirs and later serves wait for it.
+# Same table order as record_servings.
+_REBUILD_LOCK = text(
+    f"LOCK TABLE {DailyMealServing.__tablename__}, {DailyIngredientUsage.__tablename__} "
+    "IN SHARE ROW EXCLUSIVE MODE"
+)
+
+
+class RollupService:
+    def record_servings(
+        self,
+        db: Session,
+        *,
+        served_on: date,
+        portions_by_meal: Dict[UUID, int],
+        servings_by_meal: Dict[UUID, int],
+        grams_by_ingredient: Dict[UUID, int],
+    ) -> None:
+        """
+        Adds servings to the daily rollups with increment-on-conflict upserts.
+        Runs in the caller's transaction (the serve) and does not commit.
+        """
+        if portions_by_meal:
+            stmt = insert(DailyMealServing).values([
+                {
+                    "day": served_on,
+                    "meal_id": meal_id,
+                    "portions": portions_by_meal[meal_id],
+                    "servings": servings_by_meal.get(meal_id, 0),
+                }
+                # Key order keeps concurrent serves locking rollup rows in the same order.
+                for meal_id in sorted(portions_by_meal)
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[DailyMealServing.day, DailyMealServing.meal_id],
+                set_={
+                    "portions": DailyMealServing.portions + stmt.excluded.portions,
+                    "servings": DailyMealServing.servings + stmt.excluded.servings,
+                },
+            ))
+        if grams_by_ingredient:
+            stmt = insert(DailyIngredientUsage).values([
+                {"day": served_on, "ingredient_id": ingredient_id, "used_grams": grams_by_ingredient[ingredient_id]}
+                for ingredient_id in sorted(grams_by_ingredient)
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[DailyIngredientUsage.day, DailyIngredientUsage.ingredient_id],
+                set_={"used_grams": DailyIngredientUsage.used_grams + stmt.excluded.used_grams},
+            ))
+
+    def rebuild(self, db: Session, *, start_date: Optional[date] = None, end_date: Optional[date] = None) -> None:
+        """
+        Recomputes the rollups for the given days (all history by default), replacing
+        whatever was stored for them: servings from serving_logs, ingredient usage from
+        the serving_log_items consumption snapshots. Days of archived months (detached
+        from serving_logs) are left as they are. Does not commit.
+
+        Locks both rollup tables until the caller's transaction ends: serves committed
+        before are in the recomputed totals, serves still running add theirs afterwards.
+        """
+        db.execute(_REBUILD_LOCK)
+        retained_from = serving_partition_service.retained_from(db)
+        if retained_from is not None and (start_date is None or start_date < retained_from):
+            start_date = retained_from
+        logs_filter = []
+        items_filter = []
+        meal_filter = []
+        ingredient_filter = []
+        if start_date is not None:
+            start_datetime = datetime.combine(start_date, datetime.min.time())
+            logs_filter.append(ServingLog.served_at >= start_datetime)
+            items_filter.append(ServingLogItem.served_at >= start_datetime)
+            meal_filter.append(DailyMealServing.day >= start_date)
+            ingredient_filter.append(DailyIngredientUsage.day >= start_date)
+        if end_date is not None:
+            end_datetime = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+            logs_filter.append(ServingLog.served_at < end_datetime)
+            items_filter.append(ServingLogItem.served_at < end_datetime)
+            meal_filter.append(DailyMealServing.day <= end_date)
+            ingredient_filter.append(DailyIngredientUsage.day <= end_date)
+
+        db.execute(delete(DailyMealServing).where(*meal_filter))
+        db.execute(delete(DailyIngredientUsage).where(*ingredient_filter))
+
+        served_on = cast(ServingLog.served_at, Date)
+        per_meal = (
+            select(
+                served_on.label("day"),
+                ServingLog.meal_id,
+                func.sum(ServingLog.portions).label("portions"),
+                func.count().label("servings"),
+            )
+            .where(*logs_filter)
+            .group_by(served_on, ServingLog.meal_id)
+        )
+        db.execute(
+            insert(DailyMealServing).from_select(["day", "meal_id", "portions", "servings"], per_meal)
+        )
+
+        consumed_on = cast(ServingLogItem.served_at, Date)
+        per_ingredient = (
+            select(
+                consumed_on.label("day"),
+                ServingLogItem.ingredient_id,
+                func.sum(ServingLogItem.grams).label("used_grams"),
+            )
+            .where(*items_filter)
+            .group_by(consumed_on, ServingLogItem.ingredient_id)
+        )
+        db.execute(
+            insert(DailyIngredientUsage).from_select(["day", "ingredient_id", "used_grams"], per_ingredient)
+        )
+
+
+rollup_service = RollupService()
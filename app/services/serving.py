@@ -1,17 +1,42 @@
+import uuid
+from datetime import datetime
 from typing import Optional, Dict, List
+from uuid import UUID
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func, insert, select
 
-from app.models.serving_log import ServingLog
+from app.core.metrics import PORTIONS_SERVED, SERVE_REJECTIONS, SERVINGS
+from app.core.pagination import Keyset
+from app.models.serving_log import ServingLog, ServingLogItem
 from app.models.meal import Meal
 from app.models.recipe_item import RecipeItem
 from app.models.ingredient import Ingredient
-from app.schemas.serving_log import ServingLogCreate, ServeMealRequest
-from app.services.ingredient import ingredient_service
-from app.services.meal import meal_service # To get meal details
+from app.schemas.serving_log import (
+    ServingLog as ServingLogSchema,
+    ServingLogCreate,
+    ServeMealRequest,
+    ServeBatchMode,
+    ServeBatchRequest,
+    ServeBatchRejection,
+    ServeBatchResponse,
+)
+from app.services.estimate import estimate_service
+from app.services.rollup import rollup_service
+from app.services.stock import InsufficientStockError, stock_service
+from app.ws.events import event_bus
+from app.ws.inventory import serve_attempt_event
+
+def rejection_reason(error: Exception) -> str:
+    """The kitchen_serve_rejections_total reason of a failed serve."""
+    if isinstance(error, InsufficientStockError):
+        return "insufficient_stock"
+    return "invalid" if isinstance(error, ValueError) else "error"
 
 class ServingService:
+    keyset = Keyset("serving_logs", ServingLog.served_at, ServingLog.id, descending=True)
+
     def create_serving_log(self, db: Session, *, obj_in: ServingLogCreate) -> ServingLog:
         db_obj = ServingLog(
             meal_id=obj_in.meal_id,
@@ -23,66 +48,301 @@ class ServingService:
         db.refresh(db_obj)
         return db_obj
 
+    def get_recipes(self, db: Session, *, meal_ids) -> Dict[UUID, Dict[UUID, int]]:
+        """
+        Loads the per-portion recipe (ingredient_id -> grams) of several meals in a single
+        query. Meals without recipe items map to an empty dict; unknown meals are absent.
+        """
+        rows = db.execute(
+            select(Meal.id, RecipeItem.ingredient_id, RecipeItem.amount_grams)
+            .outerjoin(RecipeItem, RecipeItem.meal_id == Meal.id)
+            .where(Meal.id.in_(list(meal_ids)))
+        ).all()
+        recipes: Dict[UUID, Dict[UUID, int]] = {}
+        for meal_id, ingredient_id, amount_grams in rows:
+            recipe = recipes.setdefault(meal_id, {})
+            if ingredient_id is not None:
+                recipe[ingredient_id] = recipe.get(ingredient_id, 0) + amount_grams
+        return recipes
+
+    def get_recipe_requirements(self, db: Session, *, meal_id: str, portions: int) -> Dict[UUID, int]:
+        """Returns grams needed per ingredient to serve `portions` of a meal."""
+        recipe = self.get_recipes(db, meal_ids=[meal_id]).get(UUID(str(meal_id)))
+        if recipe is None:
+            raise ValueError(f"Meal with id {meal_id} not found.")
+        if not recipe:
+            raise ValueError(f"Meal with id {meal_id} has no recipe defined.")
+        return {ingredient_id: grams * portions for ingredient_id, grams in recipe.items()}
+
+    def record_consumption(self, db: Session, *, entries) -> None:
+        """
+        Bulk-inserts the grams actually consumed per ingredient for each serving log, given
+        (serving_log_id, served_at, {ingredient_id: grams}) entries. The snapshot is written
+        in the serve transaction and never updated, so later recipe edits cannot rewrite history.
+        """
+        rows = [
+            {"serving_log_id": log_id, "ingredient_id": ingredient_id, "grams": grams, "served_at": served_at}
+            for log_id, served_at, requirements in entries
+            for ingredient_id, grams in requirements.items()
+        ]
+        if rows:
+            db.execute(insert(ServingLogItem), rows)
+
+    def backfill_consumption(self, db: Session) -> int:
+        """
+        Writes consumption snapshots for serving logs recorded before snapshots existed,
+        derived from the current recipes (the best information left for them). Logs that
+        already have a snapshot are untouched. Does not commit; returns the rows written.
+        """
+        without_snapshot = ~select(ServingLogItem.serving_log_id).where(
+            ServingLogItem.serving_log_id == ServingLog.id
+        ).exists()
+        legacy_consumption = (
+            select(
+                ServingLog.id,
+                RecipeItem.ingredient_id,
+                func.sum(RecipeItem.amount_grams * ServingLog.portions),
+                ServingLog.served_at,
+            )
+            .join(RecipeItem, RecipeItem.meal_id == ServingLog.meal_id)
+            .where(ServingLog.served_at.isnot(None))
+            .where(without_snapshot)
+            .group_by(ServingLog.id, RecipeItem.ingredient_id, ServingLog.served_at)
+        )
+        result = db.execute(insert(ServingLogItem).from_select(
+            ["serving_log_id", "ingredient_id", "grams", "served_at"], legacy_consumption
+        ))
+        return result.rowcount
+
     def serve_meal(
         self, db: Session, *, meal_id: str, serve_request: ServeMealRequest, serving_user_id: str
     ) -> ServingLog:
-        meal = meal_service.get(db, id=meal_id)
-        if not meal:
-            raise ValueError(f"Meal with id {meal_id} not found.")
+        if serve_request.portions <= 0:
+            SERVE_REJECTIONS.labels("invalid").inc()
+            raise ValueError("Portions must be greater than 0.")
 
-        if not meal.recipe_items:
-            raise ValueError(f"Meal with id {meal_id} has no recipe defined.")
+        event_bus.publish(serve_attempt_event(meal_id, serve_request.portions, "validating"))
+        try:
+            required_ingredients = self.get_recipe_requirements(
+                db, meal_id=meal_id, portions=serve_request.portions
+            )
+            # Locks, validates and deducts every recipe ingredient in one go, so two
+            # concurrent serves can never both pass the stock check.
+            stock_service.deduct(db, requirements=required_ingredients)
+            estimate_service.refresh_for_ingredients(db, ingredient_ids=required_ingredients.keys())
 
-        required_ingredients: Dict[str, int] = {}
-        for item in meal.recipe_items:
-            ingredient_id_str = str(item.ingredient_id)
-            required_amount = item.amount_grams * serve_request.portions
-            required_ingredients[ingredient_id_str] = required_ingredients.get(ingredient_id_str, 0) + required_amount
-
-        # Validate inventory and collect ingredients to update
-        ingredients_to_update: List[Ingredient] = []
-        for ingredient_id, needed_grams in required_ingredients.items():
-            ingredient = ingredient_service.get(db, id=ingredient_id)
-            if not ingredient:
-                # This should ideally not happen if recipe ingredients are validated on meal creation/update
-                raise ValueError(f"Ingredient with id {ingredient_id} in recipe not found in inventory.")
-            if ingredient.quantity_grams < needed_grams:
-                raise ValueError(
-                    f"Not enough stock for ingredient 	'{ingredient.name}	'. Required: {needed_grams}g, Available: {ingredient.quantity_grams}g"
-                )
-            ingredients_to_update.append(ingredient)
-
-        # Deduct stock
-        for ingredient in ingredients_to_update:
-            needed_grams = required_ingredients[str(ingredient.id)]
-            ingredient.quantity_grams -= needed_grams
-            db.add(ingredient)
-        
-        # Log serving
-        # The spec says request body has user_id, but it's better to use the authenticated user (cook) if possible.
-        # For now, using serve_request.user_id as per spec, but also passing serving_user_id (authenticated user)
-        # which could be used for auditing or if the request body user_id is for something else.
-        log_entry = ServingLogCreate(
-            meal_id=meal_id, 
-            user_id=serve_request.user_id, # As per spec request body
-            portions=serve_request.portions
-        )
-        
-        # If we decide to use the authenticated user as the one logging the serving:
-        # log_entry = ServingLogCreate(meal_id=meal_id, user_id=serving_user_id, portions=serve_request.portions)
-        
-        db_serving_log = self.create_serving_log(db, obj_in=log_entry)
-        
-        # Note: The spec mentions real-time updates via WebSockets (inventory.update, serve.attempt).
-        # This service should trigger those events. That will be handled in the WebSocket implementation part.
+            served_at = datetime.now()
+            rollup_service.record_servings(
+                db,
+                served_on=served_at.date(),
+                portions_by_meal={UUID(str(meal_id)): serve_request.portions},
+                servings_by_meal={UUID(str(meal_id)): 1},
+                grams_by_ingredient=required_ingredients,
+            )
+
+            # Log serving
+            # The spec says request body has user_id, but it's better to use the authenticated user (cook) if possible.
+            # For now, using serve_request.user_id as per spec, but also passing serving_user_id (authenticated user)
+            # which could be used for auditing or if the request body user_id is for something else.
+            db_serving_log = ServingLog(
+                id=uuid.uuid4(),
+                meal_id=meal_id,
+                user_id=serve_request.user_id, # As per spec request body
+                portions=serve_request.portions,
+                served_at=served_at
+            )
+            db.add(db_serving_log)
+            db.flush()
+            self.record_consumption(db, entries=[(db_serving_log.id, served_at, required_ingredients)])
+            # Sent with the inventory.update / alerts.low_stock events queued by the deduction.
+            event_bus.publish_after_commit(db, serve_attempt_event(meal_id, serve_request.portions, "success"))
+            db.commit()
+        except Exception as e:
+            # Releases the row locks taken by the deduction.
+            db.rollback()
+            SERVE_REJECTIONS.labels(rejection_reason(e)).inc()
+            event_bus.publish(serve_attempt_event(meal_id, serve_request.portions, "error", str(e)))
+            raise
+        SERVINGS.inc()
+        PORTIONS_SERVED.inc(serve_request.portions)
+        db.refresh(db_serving_log)
 
         return db_serving_log
     
-    def get_all(self, db: Session) -> List[ServingLog]:
+    def serve_batch(
+        self, db: Session, *, batch_request: ServeBatchRequest, serving_user_id: str
+    ) -> ServeBatchResponse:
+        """
+        Serves several meals in one transaction: recipes are loaded in one query, the
+        merged ingredient requirements are locked and validated in one pass, stock is
+        deducted with a single UPDATE and all serving logs are inserted in bulk.
+
+        In ALL_OR_NOTHING mode any rejected item aborts the batch (ValueError or
+        InsufficientStockError). In BEST_EFFORT mode items are accepted in request order
+        while the remaining stock covers them and the others (including those using an
+        ingredient no longer in inventory) are reported as rejected.
+        """
+        if not batch_request.items:
+            raise ValueError("Batch must contain at least one meal.")
+        all_or_nothing = batch_request.mode == ServeBatchMode.ALL_OR_NOTHING
+
+        try:
+            recipes = self.get_recipes(db, meal_ids={item.meal_id for item in batch_request.items})
+
+            rejected: List[ServeBatchRejection] = []
+            candidates = []  # (item, requirements) pairs that passed the static checks
+            for item in batch_request.items:
+                recipe = recipes.get(item.meal_id)
+                if item.portions <= 0:
+                    reason = "Portions must be greater than 0."
+                elif recipe is None:
+                    reason = f"Meal with id {item.meal_id} not found."
+                elif not recipe:
+                    reason = f"Meal with id {item.meal_id} has no recipe defined."
+                else:
+                    candidates.append(
+                        (item, {ingredient_id: grams * item.portions for ingredient_id, grams in recipe.items()})
+                    )
+                    continue
+                if all_or_nothing:
+                    raise ValueError(reason)
+                rejected.append(ServeBatchRejection(meal_id=item.meal_id, portions=item.portions, reason=reason))
+
+            merged: Dict[UUID, int] = {}
+            for _, requirements in candidates:
+                for ingredient_id, grams in requirements.items():
+                    merged[ingredient_id] = merged.get(ingredient_id, 0) + grams
+
+            stock = stock_service.lock_ingredients(db, ingredient_ids=merged.keys())
+
+            if all_or_nothing:
+                stock_service.find_missing(requirements=merged, stock=stock)
+                shortages = stock_service.find_shortages(requirements=merged, stock=stock)
+                if shortages:
+                    raise InsufficientStockError(shortages)
+                accepted = candidates
+                to_deduct = merged
+            else:
+                available = {ingredient_id: ingredient.quantity_grams for ingredient_id, ingredient in stock.items()}
+                accepted = []
+                to_deduct = {}
+                for item, requirements in candidates:
+                    # Checked per item: an ingredient missing from one recipe only rejects that item.
+                    try:
+                        stock_service.find_missing(requirements=requirements, stock=stock)
+                    except ValueError as e:
+                        rejected.append(ServeBatchRejection(meal_id=item.meal_id, portions=item.portions, reason=str(e)))
+                        continue
+                    shortages = stock_service.find_shortages(
+                        requirements=requirements, stock=stock, available=available
+                    )
+                    if shortages:
+                        rejected.append(ServeBatchRejection(
+                            meal_id=item.meal_id,
+                            portions=item.portions,
+                            reason="Not enough stock.",
+                            shortages=shortages,
+                        ))
+                        continue
+                    for ingredient_id, grams in requirements.items():
+                        available[ingredient_id] -= grams
+                        to_deduct[ingredient_id] = to_deduct.get(ingredient_id, 0) + grams
+                    accepted.append((item, requirements))
+
+            served: List[ServingLogSchema] = []
+            if accepted:
+                stock_service.apply_deduction(db, requirements=to_deduct, stock=stock)
+                estimate_service.refresh_for_ingredients(db, ingredient_ids=to_deduct.keys())
+                served_at = datetime.now()
+                portions_by_meal: Dict[UUID, int] = {}
+                servings_by_meal: Dict[UUID, int] = {}
+                for item, _ in accepted:
+                    portions_by_meal[item.meal_id] = portions_by_meal.get(item.meal_id, 0) + item.portions
+                    servings_by_meal[item.meal_id] = servings_by_meal.get(item.meal_id, 0) + 1
+                rollup_service.record_servings(
+                    db,
+                    served_on=served_at.date(),
+                    portions_by_meal=portions_by_meal,
+                    servings_by_meal=servings_by_meal,
+                    grams_by_ingredient=to_deduct,
+                )
+                log_ids = [uuid.uuid4() for _ in accepted]
+                served_logs = db.scalars(
+                    insert(ServingLog).returning(ServingLog),
+                    [
+                        {
+                            "id": log_id,
+                            "meal_id": item.meal_id,
+                            "user_id": batch_request.user_id,
+                            "portions": item.portions,
+                            "served_at": served_at,
+                        }
+                        for log_id, (item, _) in zip(log_ids, accepted)
+                    ],
+                ).all()
+                self.record_consumption(db, entries=[
+                    (log_id, served_at, requirements) for log_id, (_, requirements) in zip(log_ids, accepted)
+                ])
+                # Serialize before committing, which would expire every returned log.
+                served = [ServingLogSchema.from_orm(log) for log in served_logs]
+            for item, _ in accepted:
+                event_bus.publish_after_commit(db, serve_attempt_event(item.meal_id, item.portions, "success"))
+            for rejection in rejected:
+                event_bus.publish_after_commit(
+                    db, serve_attempt_event(rejection.meal_id, rejection.portions, "error", rejection.reason)
+                )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            SERVE_REJECTIONS.labels(rejection_reason(e)).inc(len(batch_request.items))
+            for item in batch_request.items:
+                event_bus.publish(serve_attempt_event(item.meal_id, item.portions, "error", str(e)))
+            raise
+
+        SERVINGS.inc(len(accepted))
+        PORTIONS_SERVED.inc(sum(item.portions for item, _ in accepted))
+        for rejection in rejected:
+            SERVE_REJECTIONS.labels("insufficient_stock" if rejection.shortages else "invalid").inc()
+        return ServeBatchResponse(served=served, rejected=rejected)
+
+    # The serve path locks, deducts and refreshes through the sync services shared with the
+    # Celery tasks; async endpoints run it on the AsyncSession's connection via run_sync.
+
+    async def serve_meal_async(
+        self, db: AsyncSession, *, meal_id: str, serve_request: ServeMealRequest, serving_user_id: str
+    ) -> ServingLog:
+        return await db.run_sync(lambda session: self.serve_meal(
+            session, meal_id=meal_id, serve_request=serve_request, serving_user_id=serving_user_id
+        ))
+
+    async def serve_batch_async(
+        self, db: AsyncSession, *, batch_request: ServeBatchRequest, serving_user_id: str
+    ) -> ServeBatchResponse:
+        return await db.run_sync(lambda session: self.serve_batch(
+            session, batch_request=batch_request, serving_user_id=serving_user_id
+        ))
+
+    def get_all(
+        self,
+        db: Session,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> List[ServingLog]:
         """
-        Retrieve all serving logs ordered by creation time (most recent first).
+        Retrieve serving logs, most recent first, served in [start, end) when given, from
+        `skip` or after `cursor`. The range only scans the partitions of its months.
+        Raises ValueError for an invalid cursor.
         """
-        return db.query(ServingLog).order_by(ServingLog.created_at.desc()).all()
+        query = select(ServingLog)
+        if start is not None:
+            query = query.where(ServingLog.served_at >= start)
+        if end is not None:
+            query = query.where(ServingLog.served_at < end)
+        return db.execute(self.keyset.paginate(query, skip=skip, limit=limit, cursor=cursor)).scalars().all()
 
 serving_service = ServingService()
 
@@ -0,0 +1,156 @@
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Partitioned by month on served_at, parents first. serving_log_items references
+# serving_logs by (id, served_at), so a log and its items always sit in the same month.
+PARTITIONED_TABLES = ("serving_logs", "serving_log_items")
+
+# Serializes partition maintenance across API processes and Celery workers.
+_LOCK_KEY = "serving_log_partitions"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+class ServingLogPartitionService:
+    """
+    Keeps the monthly partitions of serving_logs and serving_log_items: creates them
+    SERVING_LOG_PARTITIONS_AHEAD months in advance, and archives the months older than
+    SERVING_LOG_RETENTION_MONTHS by detaching them into the SERVING_LOG_ARCHIVE_SCHEMA
+    schema. Reports are unaffected, as they read the daily rollups.
+
+    Works on a Session or a Connection (it also runs while the tables are created) and
+    does nothing while the tables are not partitioned (database not migrated yet).
+    """
+
+    def is_partitioned(self, db: Union[Session, Connection], table: str = "serving_logs") -> bool:
+        return bool(db.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+            {"table": table},
+        ).scalar())
+
+    def partitions(self, db: Union[Session, Connection], table: str) -> Dict[date, str]:
+        """The attached monthly partitions of `table`, by month (others are ignored)."""
+        names = db.execute(
+            text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                 "WHERE i.inhparent = to_regclass(:table)"),
+            {"table": table},
+        ).scalars()
+        pattern = re.compile(rf"^{table}_y(\d{{4}})m(\d{{2}})$")
+        months = {}
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+        return months
+
+    def retained_from(self, db: Union[Session, Connection]) -> Optional[date]:
+        """First day still held by serving_logs, or None if it is not partitioned."""
+        if not self.is_partitioned(db):
+            return None
+        return min(self.partitions(db, "serving_logs"), default=None)
+
+    def ensure_partitions(
+        self,
+        db: Union[Session, Connection],
+        *,
+        start: Optional[date] = None,
+        months_ahead: Optional[int] = None,
+        tables: Iterable[str] = PARTITIONED_TABLES,
+        today: Optional[date] = None,
+    ) -> List[str]:
+        """
+        Creates the missing partitions from the month of `start` (default: this month)
+        through `months_ahead` months after this one. Returns the created names.
+        Runs in the caller's transaction and does not commit.
+        """
+        this_month = month_start(today or date.today())
+        month = month_start(start) if start else this_month
+        last = add_months(this_month, settings.SERVING_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead)
+        tables = [table for table in tables if self.is_partitioned(db, table)]
+        if not tables:
+            return []
+        self._lock(db)
+        existing = {table: self.partitions(db, table) for table in tables}
+        created = []
+        while month <= last:
+            for table in tables:
+                if month in existing[table]:
+                    continue
+                name = partition_name(table, month)
+                db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+            month = add_months(month, 1)
+        return created
+
+    def archive_expired(
+        self,
+        db: Union[Session, Connection],
+        *,
+        retention_months: Optional[int] = None,
+        today: Optional[date] = None,
+    ) -> List[date]:
+        """
+        Detaches the partitions of the months that ended more than `retention_months`
+        months ago (0 keeps everything) and moves them to the archive schema, without
+        their foreign keys: an archived month is a frozen copy that no longer blocks
+        deleting meals, users or ingredients. Returns the archived months.
+        Runs in the caller's transaction and does not commit.
+        """
+        retention_months = settings.SERVING_LOG_RETENTION_MONTHS if retention_months is None else retention_months
+        if retention_months <= 0 or not self.is_partitioned(db):
+            return []
+        cutoff = add_months(month_start(today or date.today()), -retention_months)
+        self._lock(db)
+        schema = settings.SERVING_LOG_ARCHIVE_SCHEMA
+        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        partitions = {table: self.partitions(db, table) for table in PARTITIONED_TABLES}
+        archived = sorted(month for month in partitions["serving_logs"] if month < cutoff)
+        for month in archived:
+            # Items first: while they are attached, the logs they reference cannot be detached.
+            for table in reversed(PARTITIONED_TABLES):
+                name = partitions[table].get(month)
+                if name is None:
+                    continue
+                db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                self._drop_foreign_keys(db, name)
+                db.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+        return archived
+
+    def maintain(self, db: Union[Session, Connection], *, today: Optional[date] = None) -> Dict[str, list]:
+        """Creates the partitions ahead and archives the expired ones. Does not commit."""
+        return {
+            "created": self.ensure_partitions(db, today=today),
+            "archived": [month.isoformat() for month in self.archive_expired(db, today=today)],
+        }
+
+    @staticmethod
+    def _lock(db: Union[Session, Connection]) -> None:
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": _LOCK_KEY})
+
+    @staticmethod
+    def _drop_foreign_keys(db: Union[Session, Connection], table: str) -> None:
+        names = db.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table) AND contype = 'f'"),
+            {"table": table},
+        ).scalars().all()
+        for name in names:
+            db.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+
+serving_partition_service = ServingLogPartitionService()
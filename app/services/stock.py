@@ -0,0 +1,143 @@
+from typing import Dict, List, Mapping, Optional
+from uuid import UUID
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.ingredient import Ingredient
+from app.schemas.serving_log import IngredientShortage
+from app.services.alert import alert_service
+from app.ws.events import event_bus
+from app.ws.inventory import inventory_update_event
+
+
+class InsufficientStockError(ValueError):
+    """Raised when one or more ingredients cannot cover a requested deduction."""
+
+    def __init__(self, shortages: List[IngredientShortage]):
+        self.shortages = shortages
+        details = ", ".join(
+            f"'{s.ingredient_name}' (required: {s.required_grams}g, available: {s.available_grams}g)"
+            for s in shortages
+        )
+        super().__init__(f"Not enough stock for: {details}")
+
+
+class StockService:
+    def lock_ingredients(self, db: Session, *, ingredient_ids) -> Dict[UUID, Ingredient]:
+        """
+        Locks the given ingredient rows (SELECT ... FOR NO KEY UPDATE) and returns them keyed by id.
+        Rows are always locked in primary key order so that concurrent deductions touching
+        overlapping ingredients queue up instead of deadlocking. The lock leaves the foreign
+        key checks of rows referencing the ingredients (FOR KEY SHARE) free to proceed, e.g.
+        those of a rollup rebuild that a serve holding it is waiting for.
+        """
+        if not ingredient_ids:
+            return {}
+        rows = db.execute(
+            select(Ingredient)
+            .where(Ingredient.id.in_(list(ingredient_ids)))
+            .order_by(Ingredient.id)
+            .with_for_update(key_share=True)
+            .execution_options(populate_existing=True)
+        ).scalars().all()
+        return {row.id: row for row in rows}
+
+    def find_missing(self, *, requirements: Mapping[UUID, int], stock: Mapping[UUID, Ingredient]) -> None:
+        missing = [str(ingredient_id) for ingredient_id in requirements if ingredient_id not in stock]
+        if missing:
+            raise ValueError(f"Ingredients in recipe not found in inventory: {', '.join(missing)}")
+
+    def find_shortages(
+        self,
+        *,
+        requirements: Mapping[UUID, int],
+        stock: Mapping[UUID, Ingredient],
+        available: Optional[Mapping[UUID, int]] = None
+    ) -> List[IngredientShortage]:
+        """
+        Returns one entry per ingredient whose stock is below the required amount.
+        `available` overrides the locked quantities, e.g. with what is left after
+        earlier items of a batch.
+        """
+        shortages = []
+        for ingredient_id, needed_grams in requirements.items():
+            ingredient = stock[ingredient_id]
+            available_grams = ingredient.quantity_grams if available is None else available[ingredient_id]
+            if available_grams < needed_grams:
+                shortages.append(
+                    IngredientShortage(
+                        ingredient_id=ingredient.id,
+                        ingredient_name=ingredient.name,
+                        required_grams=needed_grams,
+                        available_grams=available_grams,
+                    )
+                )
+        return shortages
+
+    def deduct(self, db: Session, *, requirements: Mapping[UUID, int]) -> Dict[UUID, int]:
+        """
+        Atomically deducts `requirements` (ingredient_id -> grams) from inventory.
+
+        The rows are locked in a deterministic order first, then every ingredient is
+        checked and deducted by a single conditional UPDATE. Either all ingredients are
+        deducted or none are; on shortage an InsufficientStockError listing every short
+        ingredient is raised. Does not commit: the caller owns the transaction and must
+        roll back on error. Returns the new quantity of each deducted ingredient.
+        """
+        requirements = {ingredient_id: grams for ingredient_id, grams in requirements.items() if grams}
+        if not requirements:
+            return {}
+
+        stock = self.lock_ingredients(db, ingredient_ids=requirements.keys())
+        self.find_missing(requirements=requirements, stock=stock)
+
+        shortages = self.find_shortages(requirements=requirements, stock=stock)
+        if shortages:
+            raise InsufficientStockError(shortages)
+
+        return self.apply_deduction(db, requirements=requirements, stock=stock)
+
+    def apply_deduction(
+        self, db: Session, *, requirements: Mapping[UUID, int], stock: Mapping[UUID, Ingredient]
+    ) -> Dict[UUID, int]:
+        """
+        Deducts `requirements` from rows previously locked by `lock_ingredients` with a
+        single UPDATE that re-checks every quantity, and returns the new quantities.
+        Ingredients left at or below their threshold get a low-stock alert.
+        """
+        needed = case(dict(requirements), value=Ingredient.id)
+        result = db.execute(
+            update(Ingredient)
+            .where(Ingredient.id.in_(list(requirements)))
+            .where(Ingredient.quantity_grams >= needed)
+            .values(quantity_grams=Ingredient.quantity_grams - needed)
+            .returning(Ingredient.id, Ingredient.quantity_grams)
+            .execution_options(synchronize_session=False)
+        )
+        new_quantities = {row.id: row.quantity_grams for row in result}
+        if len(new_quantities) != len(requirements):
+            # The rows are locked, so this only happens if something bypassed the lock.
+            # Report against the locked snapshot; the caller's rollback undoes the partial update.
+            raise InsufficientStockError([
+                IngredientShortage(
+                    ingredient_id=ingredient_id,
+                    ingredient_name=stock[ingredient_id].name,
+                    required_grams=grams,
+                    available_grams=stock[ingredient_id].quantity_grams,
+                )
+                for ingredient_id, grams in requirements.items()
+                if ingredient_id not in new_quantities
+            ])
+
+        # Keep the identity map in step with the database without scheduling another UPDATE.
+        for ingredient_id, quantity in new_quantities.items():
+            set_committed_value(stock[ingredient_id], "quantity_grams", quantity)
+            event_bus.publish_after_commit(db, inventory_update_event(ingredient_id, quantity))
+        # Deductions only lower stock, so they can raise low-stock alerts but never clear one.
+        alert_service.raise_low_stock(db, ingredients=[stock[ingredient_id] for ingredient_id in new_quantities])
+        return new_quantities
+
+
+stock_service = StockService()
@@ -1,12 +1,40 @@
-from typing import Any, Optional
+import asyncio
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import observe_cache
+from app.core.pagination import Keyset
+from app.core.security import (
+    get_password_hash,
+    password_version,
+    verify_and_update_password,
+    verify_and_update_password_async,
+)
 from app.models.user import User, UserRole
-from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.user import TokenData, UserCreate, UserUpdate
+
+# Authenticated users by id (or ("username", name) for tokens without an id): a snapshot
+# of the columns requests use, so that most authenticated requests skip the users table.
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE, ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
+observe_cache("principal", principal_cache)
+PRINCIPAL_FIELDS = ("id", "username", "email", "role", "created_at")
 
 class UserService:
+    keyset = Keyset("users", User.username)
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[User]:
+        """Users by username, from `skip` or after `cursor`. Raises ValueError for an invalid cursor."""
+        return db.execute(self.keyset.paginate(select(User), skip=skip, limit=limit, cursor=cursor)).scalars().all()
+
     def get_by_username(self, db: Session, *, username: str) -> Optional[User]:
         return db.query(User).filter(User.username == username).first()
 
@@ -26,6 +54,7 @@ class UserService:
         return db_obj
 
     def update(self, db: Session, *, db_obj: User, obj_in: UserUpdate) -> User:
+        old_username = db_obj.username
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
@@ -35,23 +64,136 @@ class UserService:
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["password_hash"] = hashed_password
+            # Revokes the tokens issued so far
+            update_data["credential_version"] = User.credential_version + 1
         
         for field, value in update_data.items():
             setattr(db_obj, field, value)
             
         db.add(db_obj)
         db.commit()
+        # Role or password changes must apply to the user's next request.
+        self.invalidate_principal(db_obj, old_username)
         db.refresh(db_obj)
         return db_obj
 
+    def remove(self, db: Session, *, db_obj: User) -> User:
+        user_id, username = db_obj.id, db_obj.username
+        db.delete(db_obj)
+        db.commit()
+        principal_cache.invalidate(str(user_id), ("username", username))
+        return db_obj
+
+    def get_principal(self, db: Session, *, token_data: TokenData) -> Optional[User]:
+        """
+        The user a valid token was issued to, from the principal cache when possible,
+        as a detached User carrying PRINCIPAL_FIELDS (not attached to `db`). Returns None
+        if the user no longer exists; raises ValueError if the password was changed after
+        the token was issued. A token newer than the cached user reloads it first.
+        """
+        key, statement = self._principal_lookup(token_data)
+        load = lambda: self._principal_snapshot(db.execute(statement).scalars().first())
+        snapshot = principal_cache.get_or_load(key, load)
+        if self._newer_than_cached(snapshot, token_data):
+            principal_cache.invalidate(key)
+            snapshot = principal_cache.get_or_load(key, load)
+        return self._principal_user(snapshot, token_data)
+
+    async def get_principal_async(self, db: AsyncSession, *, token_data: TokenData) -> Optional[User]:
+        """get_principal for async endpoints."""
+        key, statement = self._principal_lookup(token_data)
+
+        async def load() -> Optional[Dict[str, Any]]:
+            return self._principal_snapshot((await db.execute(statement)).scalars().first())
+
+        snapshot = await principal_cache.get_or_load_async(key, load)
+        if self._newer_than_cached(snapshot, token_data):
+            principal_cache.invalidate(key)
+            snapshot = await principal_cache.get_or_load_async(key, load)
+        return self._principal_user(snapshot, token_data)
+
+    @staticmethod
+    def _principal_lookup(token_data: TokenData) -> Tuple[Hashable, Select]:
+        if token_data.uid is not None:
+            return str(token_data.uid), select(User).where(User.id == token_data.uid)
+        # Token issued before tokens carried the user id
+        return ("username", token_data.username), select(User).where(User.username == token_data.username)
+
+    @staticmethod
+    def _newer_than_cached(snapshot: Optional[Dict[str, Any]], token_data: TokenData) -> bool:
+        """
+        The token was issued after a password change this process has not seen: the change
+        was made through another worker, whose invalidation only reached its own cache.
+        """
+        if snapshot is None or token_data.pv is None or not token_data.pv.isdigit():
+            return False
+        return int(token_data.pv) > snapshot["credential_version"]
+
+    @staticmethod
+    def _principal_user(snapshot: Optional[Dict[str, Any]], token_data: TokenData) -> Optional[User]:
+        if snapshot is None:
+            return None
+        if token_data.pv is not None and token_data.pv != password_version(snapshot["credential_version"]):
+            raise ValueError("Token is no longer valid: the password was changed.")
+        return User(**{field: snapshot[field] for field in PRINCIPAL_FIELDS})
+
+    @staticmethod
+    def _principal_snapshot(user: Optional[User]) -> Optional[Dict[str, Any]]:
+        if user is None:
+            return None
+        snapshot = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        snapshot["credential_version"] = user.credential_version
+        return snapshot
+
+    def invalidate_principal(self, user: User, *other_usernames: str) -> None:
+        """Drops the user's cached principal (in this process; other workers within the TTL)."""
+        principal_cache.invalidate(
+            str(user.id), ("username", user.username), *(("username", name) for name in other_usernames)
+        )
+
     def authenticate(self, db: Session, *, username: str, password: str) -> Optional[User]:
         user = self.get_by_username(db, username=username)
         if not user:
             return None
-        if not verify_password(password, user.password_hash):
+        valid, new_hash = verify_and_update_password(password, user.password_hash)
+        if not valid:
+            return None
+        if new_hash:
+            self._store_rehash(db, user, new_hash)
+            db.refresh(user)
+        return user
+
+    async def authenticate_async(self, db: Session, *, username: str, password: str) -> Optional[User]:
+        """
+        authenticate() for async endpoints: the queries run in a worker thread and the
+        bcrypt verification on the password pool, so no request thread waits on bcrypt.
+        """
+        user = await asyncio.to_thread(self._get_detached_by_username, db, username)
+        if not user:
+            return None
+        valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+        if not valid:
             return None
+        if new_hash:
+            await asyncio.to_thread(self._store_rehash, db, user, new_hash)
         return user
 
+    def _get_detached_by_username(self, db: Session, username: str) -> Optional[User]:
+        user = self.get_by_username(db, username=username)
+        # Gives the connection back to the pool while bcrypt runs, which can take seconds
+        # during a burst of logins; the user stays loaded, detached from the session.
+        db.close()
+        return user
+
+    def _store_rehash(self, db: Session, user: User, new_hash: str) -> None:
+        """
+        Saves the password re-hashed with the current bcrypt cost (same password). The
+        credential version is kept, so the tokens the user holds stay valid.
+        """
+        db.query(User).filter(User.id == user.id).update({User.password_hash: new_hash})
+        db.commit()
+        user.password_hash = new_hash
+
     def is_superuser(self, user: User) -> bool:
         return user.role == UserRole.ADMIN
 
@@ -0,0 +1,41 @@
+from celery import shared_task
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.models.ingredient import Ingredient
+from app.services.alert import alert_service
+
+@shared_task(name="tasks.sync_low_stock_alerts")
+def sync_low_stock_alerts():
+    """
+    Raise a low-stock alert for every ingredient at or below its threshold and resolve
+    the open ones of ingredients above it. Stock writes keep the alerts current; this
+    catches ingredients whose stock was not written since (e.g. already low when alerts
+    were introduced, or changed by hand in the database). Runs daily from Celery beat
+    (the migration creating the alerts table does the same); safe to run any number of times.
+
+    Returns:
+        dict: Number of ingredients checked and of open low-stock alerts
+    """
+    db = SessionLocal()
+    try:
+        ingredients = db.execute(select(Ingredient).order_by(Ingredient.id)).scalars().all()
+        alert_service.sync_low_stock(db, ingredients=ingredients)
+        db.commit()
+        return {
+            "status": "success",
+            "ingredients_checked": len(ingredients),
+            "low_stock": sum(1 for ing in ingredients if ing.quantity_grams <= ing.low_threshold_grams)
+        }
+    except Exception as e:
+        db.rollback()
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+    finally:
+        db.close()
+
+# Allows running it without a worker: python -m app.tasks.alerts
+if __name__ == "__main__":
+    print(sync_low_stock_alerts())
@@ -15,8 +15,9 @@ def recalculate_estimates():
     """
     db = SessionLocal()
     try:
-        # Use the existing estimate service to calculate max portions
-        estimates = estimate_service.calculate_max_portions_for_all_meals(db)
+        # Recompute every meal and refresh the maintained estimate store
+        estimates = estimate_service.rebuild(db)
+        db.commit()
         
         # Convert to serializable format for Celery result
         result = {
@@ -31,12 +32,10 @@ def recalculate_estimates():
             ],
             "total_meals": len(estimates)
         }
-        
-        # Here you could also store the results in a cache (Redis, etc.)
-        # for faster retrieval by the API endpoint
-        
+
         return result
     except Exception as e:
+        db.rollback()
         return {
             "status": "error",
             "message": str(e)
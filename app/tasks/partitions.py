@@ -0,0 +1,32 @@
+from celery import shared_task
+
+from app.core.database import SessionLocal
+from app.services.serving_partition import serving_partition_service
+
+@shared_task(name="tasks.maintain_serving_log_partitions")
+def maintain_serving_log_partitions():
+    """
+    Create the serving log partitions of the coming months and archive the expired ones
+    (see SERVING_LOG_PARTITIONS_AHEAD and SERVING_LOG_RETENTION_MONTHS). Runs daily from
+    Celery beat; safe to run any number of times.
+
+    Returns:
+        dict: Created partitions and archived months
+    """
+    db = SessionLocal()
+    try:
+        result = serving_partition_service.maintain(db)
+        db.commit()
+        return {"status": "success", **result}
+    except Exception as e:
+        db.rollback()
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+    finally:
+        db.close()
+
+# Allows running it without a worker: python -m app.tasks.partitions
+if __name__ == "__main__":
+    print(maintain_serving_log_partitions())
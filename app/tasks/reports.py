@@ -2,7 +2,8 @@ from datetime import datetime
 from celery import shared_task
 from sqlalchemy.orm import Session
 
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, replica_router
+from app.services.alert import alert_service, DISCREPANCY_THRESHOLD
 from app.services.report import report_service
 
 @shared_task(name="tasks.generate_monthly_report")
@@ -10,7 +11,8 @@ def generate_monthly_report(year=None, month=None):
     """
     Generate monthly summary report for a specific month.
     If year and month are not provided, it will generate for the previous month.
-    This task can be triggered manually via API or scheduled.
+    This task can be triggered manually via API and runs on the 1st of each month
+    (see beat_schedule in worker.py), which records the month's discrepancy alert.
     
     Args:
         year (int, optional): Year for the report. Defaults to previous month's year.
@@ -20,6 +22,8 @@ def generate_monthly_report(year=None, month=None):
         dict: Monthly summary report data
     """
     db = SessionLocal()
+    # The summary only reads, from a replica when one is healthy; the alert goes to the primary.
+    read_db = replica_router.read_session()
     try:
         # If year and month not provided, use previous month
         if year is None or month is None:
@@ -32,7 +36,7 @@ def generate_monthly_report(year=None, month=None):
                 year = today.year
         
         # Use the existing report service to generate the monthly summary
-        summary = report_service.get_monthly_summary(db, year=year, month=month)
+        summary = report_service.get_monthly_summary(read_db, year=year, month=month)
         
         # Convert to serializable format for Celery result
         result = {
@@ -45,18 +49,23 @@ def generate_monthly_report(year=None, month=None):
             }
         }
         
-        # Check if discrepancy is above threshold (10%)
-        if summary.discrepancy_rate > 10.0:
+        # Once the month is over, store its discrepancy alert (once) if above the threshold
+        month_closed = (year, month) < (datetime.today().year, datetime.today().month)
+        if month_closed and alert_service.record_discrepancy(db, year=year, month=month, summary=summary):
+            db.commit()
+        if summary.discrepancy_rate > DISCREPANCY_THRESHOLD:
             result["alert"] = {
                 "type": "discrepancy",
-                "message": f"Monthly discrepancy for {year}-{month:02d} is {summary.discrepancy_rate}%, which is above the 10% threshold."
+                "message": f"Monthly discrepancy for {year}-{month:02d} is {summary.discrepancy_rate}%, which is above the {DISCREPANCY_THRESHOLD:g}% threshold."
             }
         
         return result
     except Exception as e:
+        db.rollback()
         return {
             "status": "error",
             "message": str(e)
         }
     finally:
+        read_db.close()
         db.close()
@@ -0,0 +1,54 @@
+import argparse
+from datetime import date
+from celery import shared_task
+
+from app.core.database import SessionLocal
+from app.services.rollup import rollup_service
+from app.services.serving import serving_service
+
+@shared_task(name="tasks.rebuild_daily_rollups")
+def rebuild_daily_rollups(start_date=None, end_date=None):
+    """
+    Rebuild the daily consumption rollups (daily_meal_servings, daily_ingredient_usage)
+    from serving_logs and their consumption snapshots. Serving logs recorded before
+    snapshots existed first get one derived from the current recipes. Used to backfill
+    history recorded before the rollups existed, or to repair a range after manual data fixes.
+
+    Args:
+        start_date (str, optional): First day to rebuild (YYYY-MM-DD). Defaults to all history.
+        end_date (str, optional): Last day to rebuild (YYYY-MM-DD). Defaults to all history.
+
+    Returns:
+        dict: Status of the rebuild
+    """
+    db = SessionLocal()
+    try:
+        backfilled = serving_service.backfill_consumption(db)
+        rollup_service.rebuild(
+            db,
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            end_date=date.fromisoformat(end_date) if end_date else None,
+        )
+        db.commit()
+        return {
+            "status": "success",
+            "snapshots_backfilled": backfilled,
+            "start_date": start_date,
+            "end_date": end_date
+        }
+    except Exception as e:
+        db.rollback()
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+    finally:
+        db.close()
+
+# Allows a one-off backfill without a worker: python -m app.tasks.rollups --from 2024-01-01
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily consumption rollups from serving logs.")
+    parser.add_argument("--from", dest="start_date", help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    print(rebuild_daily_rollups(start_date=args.start_date, end_date=args.end_date))
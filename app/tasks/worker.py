@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.schedules import crontab
 from app.core.config import settings
+from app.core.metrics import observe_celery
 
 # Create Celery instance
 celery_app = Celery(
@@ -7,8 +9,11 @@ celery_app = Celery(
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
     include=[
+        "app.tasks.alerts",
         "app.tasks.estimates",
-        "app.tasks.reports"
+        "app.tasks.partitions",
+        "app.tasks.reports",
+        "app.tasks.rollups"
     ]
 )
 
@@ -19,8 +24,28 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        # Closes the previous month: its summary and, if needed, its discrepancy alert.
+        "close-previous-month": {
+            "task": "tasks.generate_monthly_report",
+            "schedule": crontab(minute=15, hour=0, day_of_month=1),
+        },
+        # Keeps serving log partitions created ahead and archives the expired months.
+        "maintain-serving-log-partitions": {
+            "task": "tasks.maintain_serving_log_partitions",
+            "schedule": crontab(minute=5, hour=0),
+        },
+        # Catches low stock that no stock write reported (see tasks.sync_low_stock_alerts).
+        "sync-low-stock-alerts": {
+            "task": "tasks.sync_low_stock_alerts",
+            "schedule": crontab(minute=10, hour=0),
+        },
+    },
 )
 
+# Task durations, served by the worker on CELERY_METRICS_PORT
+observe_celery(celery_app)
+
 # This allows the worker to be started directly from this file
 if __name__ == "__main__":
     celery_app.start()
@@ -7,5 +7,5 @@ def validate_uuid(id_str: str) -> None:
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid meal ID '{id_str}'. A valid UUID is expected."
+            detail=f"Invalid ID '{id_str}'. A valid UUID is expected."
         )
\ No newline at end of file
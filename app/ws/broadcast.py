@@ -0,0 +1,146 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Called with (topic, key, serialized message) to hand a broadcast to this process's sockets.
+Deliver = Callable[[str, Optional[str], str], Awaitable[None]]
+
+def encode_envelope(topic: str, key: Optional[str], text: str) -> str:
+    """Frames a serialized message with its routing fields; the JSON payload itself is never re-encoded."""
+    return f"{topic}\n{key or ''}\n{text}"
+
+def decode_envelope(envelope: str) -> Tuple[str, Optional[str], str]:
+    topic, key, text = envelope.split("\n", 2)
+    return topic, key or None, text
+
+class BroadcastBackend:
+    """
+    Carries WebSocket broadcasts between the processes serving the API. A broadcast is
+    published once; every process subscribed to the backend, the publisher included,
+    delivers it to its own sockets through the `deliver` callback given to `start`.
+    """
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, topic: str, key: Optional[str], text: str) -> None:
+        raise NotImplementedError
+
+class LocalBackend(BroadcastBackend):
+    """Single-process fan-out (the default): publishing delivers straight to local sockets."""
+
+    async def publish(self, topic: str, key: Optional[str], text: str) -> None:
+        await self.deliver(topic, key, text)
+
+class _ListeningBackend(BroadcastBackend):
+    """Backend with a background task that reads envelopes from a broker and delivers them."""
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        self.listener.cancel()
+        try:
+            await self.listener
+        except asyncio.CancelledError:
+            pass
+
+    async def listen(self) -> None:
+        raise NotImplementedError
+
+    async def dispatch(self, envelope: str) -> None:
+        try:
+            await self.deliver(*decode_envelope(envelope))
+        except Exception as e:
+            # One bad message must not stop the listener.
+            print(f"WebSocket broadcast delivery error: {e}")
+
+class MemoryBroker:
+    """In-memory stand-in for a pub/sub server, for tests: backends sharing a broker act like separate workers."""
+
+    def __init__(self):
+        self.subscribers: List[asyncio.Queue] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.remove(queue)
+
+    def publish(self, envelope: str) -> None:
+        for queue in self.subscribers:
+            queue.put_nowait(envelope)
+
+class MemoryBackend(_ListeningBackend):
+    def __init__(self, broker: Optional[MemoryBroker] = None):
+        self.broker = broker or MemoryBroker()
+
+    async def start(self, deliver: Deliver) -> None:
+        self.queue = self.broker.subscribe()
+        await super().start(deliver)
+
+    async def stop(self) -> None:
+        await super().stop()
+        self.broker.unsubscribe(self.queue)
+
+    async def publish(self, topic: str, key: Optional[str], text: str) -> None:
+        self.broker.publish(encode_envelope(topic, key, text))
+
+    async def listen(self) -> None:
+        while True:
+            await self.dispatch(await self.queue.get())
+
+class RedisBackend(_ListeningBackend):
+    """
+    Fan-out across processes over Redis pub/sub (the Redis already used by Celery).
+    Pub/sub is at-most-once: messages published while a process is reconnecting are
+    lost for its clients, who get the next update or reload on reconnect.
+    """
+
+    def __init__(self, url: str, channel: str):
+        import redis.asyncio as redis  # Only needed when this backend is configured
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.channel = channel
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self.redis.aclose()
+
+    async def publish(self, topic: str, key: Optional[str], text: str) -> None:
+        await self.redis.publish(self.channel, encode_envelope(topic, key, text))
+
+    async def listen(self) -> None:
+        retry_delay = 0.5
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    retry_delay = 0.5
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket broadcast listener error, reconnecting in {retry_delay}s: {e}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+def get_broadcast_backend() -> BroadcastBackend:
+    """Builds the backend selected by settings.WS_BROADCAST_BACKEND."""
+    name = settings.WS_BROADCAST_BACKEND
+    if name == "local":
+        return LocalBackend()
+    if name == "redis":
+        return RedisBackend(settings.WS_BROADCAST_REDIS_URL or settings.CELERY_BROKER_URL, settings.WS_BROADCAST_CHANNEL)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown WS_BROADCAST_BACKEND '{name}' (expected local, redis or memory)")
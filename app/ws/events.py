@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.ws.inventory import broadcast_event, event_key
+
+# Events that only report a current value: a burst for the same key is sent once, with the last value.
+COALESCED_EVENTS = {"inventory.update", "estimates.update"}
+
+# Session.info entry holding the events of the transaction in progress
+_PENDING = "ws_pending_events"
+
+class EventBus:
+    """
+    Hands WebSocket events from sync code (services running in the threadpool) to the
+    event loop without blocking: `publish` only schedules the event on the loop with
+    call_soon_threadsafe, where it is queued and broadcast by a dispatcher task.
+
+    Repeated inventory.update / estimates.update events for the same id within
+    WS_EVENT_COALESCE_SECONDS are merged into one carrying the latest value. Before
+    `start` (e.g. in Celery workers or scripts) publishing is a no-op.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.pending = {}
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        self.loop = None
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+            self.dispatcher = None
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """Schedules `message` for broadcast. Safe to call from any thread; never blocks."""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._accept, message)
+        except RuntimeError:
+            pass  # Loop already closed (shutdown)
+
+    def publish_after_commit(self, db: Session, message: Dict[str, Any]) -> None:
+        """Publishes `message` once `db` commits; dropped if the transaction rolls back."""
+        db.info.setdefault(_PENDING, []).append(message)
+
+    def _accept(self, message: Dict[str, Any]) -> None:
+        # Runs on the event loop.
+        key = event_key(message)
+        if message["event"] not in COALESCED_EVENTS or key is None:
+            self.queue.put_nowait(message)
+            return
+        pending_key = (message["event"], key)
+        if pending_key not in self.pending:
+            self.loop.call_later(settings.WS_EVENT_COALESCE_SECONDS, self._flush, pending_key)
+        self.pending[pending_key] = message
+
+    def _flush(self, pending_key: Tuple[str, str]) -> None:
+        message = self.pending.pop(pending_key, None)
+        if message is not None and self.queue is not None:
+            self.queue.put_nowait(message)
+
+    async def _dispatch(self) -> None:
+        while True:
+            message = await self.queue.get()
+            try:
+                await broadcast_event(message)
+            except Exception as e:
+                print(f"WebSocket event dispatch error: {e}")
+
+event_bus = EventBus()
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session: Session) -> None:
+    for message in session.info.pop(_PENDING, ()):
+        event_bus.publish(message)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_events(session: Session) -> None:
+    session.info.pop(_PENDING, None)
@@ -1,39 +1,205 @@
+import asyncio
+import json
+from fnmatch import fnmatchcase
+from typing import Dict, Any, Iterable, Optional, Set
+
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict, Any
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.metrics import WS_EVICTIONS, observe_websockets
+from app.ws.broadcast import BroadcastBackend, get_broadcast_backend
+
+# WebSocket close code for "Try Again Later": the client is evicted because it could not keep up.
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class Connection:
+    """
+    One client socket with its topic subscriptions and a bounded send queue.
+
+    Messages are queued already serialized and written by the connection's own sender
+    task, so a slow or dead client only ever delays itself. If the queue overflows or a
+    single send exceeds the timeout, the client is evicted (closed with code 1013); it is
+    expected to reconnect and reload the current state.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.manager = manager
+        # topic pattern -> ids of interest, None meaning every id
+        self.subscriptions: Dict[str, Optional[Set[str]]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def subscribe(self, topic: str, ids: Optional[Iterable[str]] = None) -> None:
+        """Subscribes to `topic` (fnmatch pattern such as "alerts.*"), optionally only for some ids."""
+        if ids is None:
+            self.subscriptions[topic] = None
+            return
+        current = self.subscriptions.get(topic, set())
+        if current is not None:  # Already subscribed to every id otherwise
+            self.subscriptions[topic] = current | {str(i) for i in ids}
+
+    def unsubscribe(self, topic: str, ids: Optional[Iterable[str]] = None) -> None:
+        if ids is None:
+            self.subscriptions.pop(topic, None)
+            return
+        current = self.subscriptions.get(topic)
+        if current:
+            current.difference_update(str(i) for i in ids)
+            if not current:
+                del self.subscriptions[topic]
+
+    def wants(self, topic: str, key: Optional[str]) -> bool:
+        for pattern, ids in self.subscriptions.items():
+            if fnmatchcase(topic, pattern) and (ids is None or key is None or key in ids):
+                return True
+        return False
+
+    def enqueue(self, text: str) -> bool:
+        """Queues a serialized message without waiting; returns False if the client has to be evicted."""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def run_sender(self) -> None:
+        try:
+            while True:
+                text = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Timed out or the socket is gone: drop the client instead of retrying.
+            await self.manager.evict(self)
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, backend: Optional[BroadcastBackend] = None):
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        self.backend = backend or get_broadcast_backend()
+        self.started = False
+
+    async def start(self) -> None:
+        """Starts the broadcast backend; called from the app lifespan, or lazily on first use."""
+        if not self.started:
+            self.started = True
+            await self.backend.start(self.deliver)
+
+    async def stop(self) -> None:
+        if self.started:
+            self.started = False
+            await self.backend.stop()
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None) -> Connection:
+        """
+        Accepts the socket and starts its sender task. Without `topics` the client
+        receives every event until it sends its first subscribe message.
+        """
+        await self.start()
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket, self)
+        for topic in topics or ["*"]:
+            connection.subscribe(topic)
+        connection.sender = asyncio.create_task(connection.run_sender())
+        self.active_connections[websocket] = connection
+        return connection
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            connection.closed = True
+            if connection.sender is not None and connection.sender is not asyncio.current_task():
+                connection.sender.cancel()
+
+    async def evict(self, connection: Connection) -> None:
+        """Drops a slow or broken client and closes its socket (best effort, bounded in time)."""
+        if connection.closed:
+            return
+        WS_EVICTIONS.inc()
+        self.disconnect(connection.websocket)
+        try:
+            await asyncio.wait_for(
+                connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE),
+                timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            pass
+
+    @staticmethod
+    def serialize(message: Dict[str, Any]) -> str:
+        return json.dumps(jsonable_encoder(message), separators=(",", ":"))
 
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
-        await websocket.send_json(message)
+        connection = self.active_connections.get(websocket)
+        if connection is not None and not connection.enqueue(self.serialize(message)):
+            await self.evict(connection)
 
-    async def broadcast(self, message: Dict[str, Any]):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+    async def broadcast(self, message: Dict[str, Any], *, key: Optional[str] = None) -> None:
+        """
+        Publishes `message` to the clients subscribed to its event (optionally restricted to
+        `key`, e.g. the ingredient id) in every process, through the broadcast backend. The
+        payload is serialized once and the call never waits on a socket.
+        """
+        await self.start()
+        topic = message.get("event", "")
+        text = self.serialize(message)
+        try:
+            await self.backend.publish(topic, key, text)
+        except Exception as e:
+            # Broker unreachable: at least this process's clients get the update.
+            print(f"WebSocket broadcast publish error: {e}")
+            await self.deliver(topic, key, text)
 
+    async def deliver(self, topic: str, key: Optional[str], text: str) -> int:
+        """Queues an already serialized broadcast for the matching local clients; returns how many."""
+        delivered = 0
+        overflowed = []
+        for connection in list(self.active_connections.values()):
+            if not connection.wants(topic, key):
+                continue
+            if connection.enqueue(text):
+                delivered += 1
+            else:
+                overflowed.append(connection)
+        for connection in overflowed:
+            await self.evict(connection)
+        return delivered
+
+# One manager per process; WS_BROADCAST_BACKEND decides how broadcasts reach the other processes.
 manager = ConnectionManager()
+observe_websockets(manager)
 
 # Example event structures based on spec
 # {"event": "inventory.update", "data": {"ingredient_id": "uuid", "new_quantity_grams": 1500}}
 # {"event": "alerts.low_stock", "data": {"ingredient_id": "uuid", "name": "Carrot", "quantity_grams": 40, "threshold": 50}}
 # {"event": "serve.attempt", "data": {"meal_id": "uuid", "portions": 10, "status": "validating" | "success" | "error", "message": "Optional error message"}}
+# {"event": "estimates.update", "data": {"meal_id": "uuid", "max_portions_possible": 12}}
 
-async def broadcast_inventory_update(ingredient_id: str, new_quantity_grams: int):
-    await manager.broadcast({
+# The data field that subscriptions with ids filter on, per event
+EVENT_KEYS = {
+    "inventory.update": "ingredient_id",
+    "alerts.low_stock": "ingredient_id",
+    "serve.attempt": "meal_id",
+    "estimates.update": "meal_id",
+}
+
+def event_key(message: Dict[str, Any]) -> Optional[str]:
+    field = EVENT_KEYS.get(message["event"])
+    return None if field is None else message["data"].get(field)
+
+def inventory_update_event(ingredient_id, new_quantity_grams: int) -> Dict[str, Any]:
+    return {
         "event": "inventory.update",
         "data": {"ingredient_id": str(ingredient_id), "new_quantity_grams": new_quantity_grams}
-    })
+    }
 
-async def broadcast_low_stock_alert(ingredient_id: str, name: str, quantity_grams: int, threshold: int):
-    await manager.broadcast({
+def low_stock_alert_event(ingredient_id, name: str, quantity_grams: int, threshold: int) -> Dict[str, Any]:
+    return {
         "event": "alerts.low_stock",
         "data": {
             "ingredient_id": str(ingredient_id),
@@ -41,9 +207,9 @@ async def broadcast_low_stock_alert(ingredient_id: str, name: str, quantity_gram
             "quantity_grams": quantity_grams,
             "threshold": threshold
         }
-    })
+    }
 
-async def broadcast_serve_attempt(meal_id: str, portions: int, status: str, message: str = None, websocket: WebSocket = None):
+def serve_attempt_event(meal_id, portions: int, status: str, message: str = None) -> Dict[str, Any]:
     payload = {
         "event": "serve.attempt",
         "data": {
@@ -54,26 +220,81 @@ async def broadcast_serve_attempt(meal_id: str, portions: int, status: str, mess
     }
     if message:
         payload["data"]["message"] = message
-    
+    return payload
+
+def estimate_update_event(meal_id, max_portions_possible: int) -> Dict[str, Any]:
+    return {
+        "event": "estimates.update",
+        "data": {"meal_id": str(meal_id), "max_portions_possible": max_portions_possible}
+    }
+
+async def broadcast_event(message: Dict[str, Any]):
+    await manager.broadcast(message, key=event_key(message))
+
+async def broadcast_inventory_update(ingredient_id: str, new_quantity_grams: int):
+    await broadcast_event(inventory_update_event(ingredient_id, new_quantity_grams))
+
+async def broadcast_low_stock_alert(ingredient_id: str, name: str, quantity_grams: int, threshold: int):
+    await broadcast_event(low_stock_alert_event(ingredient_id, name, quantity_grams, threshold))
+
+async def broadcast_serve_attempt(meal_id: str, portions: int, status: str, message: str = None, websocket: WebSocket = None):
+    payload = serve_attempt_event(meal_id, portions, status, message)
     if websocket: # If a specific client initiated, send to them first or only them
         await manager.send_personal_message(payload, websocket)
     else: # Or broadcast to all if it's a general update after completion
-        await manager.broadcast(payload)
+        await broadcast_event(payload)
 
 # WebSocket endpoint itself
 from fastapi import APIRouter
 
 router = APIRouter()
 
+# Client -> server control messages:
+# {"action": "subscribe", "topic": "inventory.update", "ids": ["<ingredient uuid>", ...]}  (ids optional: all)
+# {"action": "subscribe", "topic": "alerts.*"}
+# {"action": "unsubscribe", "topic": "serve.attempt", "ids": ["<meal uuid>"]}
+# The first subscribe replaces the default "everything" subscription of a new connection.
+
+def handle_control_message(connection: Connection, raw: str, *, first_subscribe: bool) -> Dict[str, Any]:
+    try:
+        request = json.loads(raw)
+        action = request["action"]
+        topic = request["topic"]
+        ids = request.get("ids")
+        if not isinstance(topic, str) or (ids is not None and not isinstance(ids, list)):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return {"event": "error", "data": {"message": "Expected {\"action\": \"subscribe\"|\"unsubscribe\", \"topic\": str, \"ids\": [str]}"}}
+
+    if action == "subscribe":
+        if first_subscribe:
+            connection.subscriptions.clear()
+        connection.subscribe(topic, ids)
+    elif action == "unsubscribe":
+        connection.unsubscribe(topic, ids)
+    else:
+        return {"event": "error", "data": {"message": f"Unknown action '{action}'"}}
+    return {
+        "event": "subscriptions",
+        "data": {
+            pattern: None if subscribed_ids is None else sorted(subscribed_ids)
+            for pattern, subscribed_ids in connection.subscriptions.items()
+        }
+    }
+
 @router.websocket("/ws/inventory")
 async def websocket_inventory_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Optional initial topics: /ws/inventory?topics=inventory.update,alerts.*
+    topics = [t for t in websocket.query_params.get("topics", "").split(",") if t]
+    connection = await manager.connect(websocket, topics=topics)
+    first_subscribe = not topics
     try:
         while True:
-            # We can receive messages from client if needed, but spec focuses on server-to-client
-            data = await websocket.receive_text() 
-            # For now, just keep connection alive. Could echo or process client messages.
-            # await manager.send_personal_message(f"Message text was: {data}", websocket)
+            data = await websocket.receive_text()
+            reply = handle_control_message(connection, data, first_subscribe=first_subscribe)
+            if reply["event"] == "subscriptions":
+                first_subscribe = False
+            await manager.send_personal_message(reply, websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         # Optionally log disconnects
@@ -81,4 +302,3 @@ async def websocket_inventory_endpoint(websocket: WebSocket):
         # Log other exceptions
         print(f"WebSocket Error: {e}")
         manager.disconnect(websocket)
-
@@ -0,0 +1,101 @@
+"""
+Benchmark of the cost of collecting metrics.
+
+Measures, in-process and without a database:
+
+- the per-request overhead of MetricsMiddleware (and of QueryStatsMiddleware, for
+  comparison) around a minimal ASGI endpoint
+- the per-checkout overhead of the timed connection pool against a plain QueuePool
+- the time to render /metrics
+
+Usage:
+    python -m benchmarks.bench_metrics_overhead --requests 50000
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable
+
+from sqlalchemy.pool import QueuePool
+
+from app.core.metrics import MetricsMiddleware, TimedQueuePool, render_latest
+from app.core.sql_instrumentation import QueryStatsMiddleware
+
+
+class _Route:
+    path = "/api/v1/meals/{meal_id}"
+    path_format = path
+
+
+async def endpoint(scope, receive, send) -> None:
+    # What the router leaves in the scope for the middlewares to read
+    scope["route"] = _Route
+    scope["path_params"] = {"meal_id": "4f0c7a52-1f1e-4a7b-9d0e-5d6f0f3b2a11"}
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+def time_requests(app: Callable, requests: int) -> float:
+    """Microseconds per request through `app`."""
+
+    async def run() -> float:
+        started = time.perf_counter()
+        for _ in range(requests):
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/meals/4f0c7a52-1f1e-4a7b-9d0e-5d6f0f3b2a11"}
+            await app(scope, receive, send)
+        return (time.perf_counter() - started) / requests * 1e6
+
+    return min(asyncio.run(run()) for _ in range(3))
+
+
+class _Connection:
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def time_checkouts(pool_class, checkouts: int) -> float:
+    """Microseconds per checkout and return of a pooled connection."""
+    pool = pool_class(_Connection, pool_size=5, max_overflow=0, logging_name="bench", reset_on_return=None)
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(checkouts):
+            pool.connect().close()
+        best = min(best, (time.perf_counter() - started) / checkouts * 1e6)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    bare = time_requests(endpoint, args.requests)
+    metrics = time_requests(MetricsMiddleware(endpoint), args.requests)
+    queries = time_requests(QueryStatsMiddleware(endpoint), args.requests)
+    both = time_requests(MetricsMiddleware(QueryStatsMiddleware(endpoint)), args.requests)
+    print(f"request  bare {bare:6.2f} us   +metrics {metrics - bare:5.2f} us   "
+          f"+query stats {queries - bare:5.2f} us   +both {both - bare:5.2f} us")
+
+    plain = time_checkouts(QueuePool, args.requests)
+    timed = time_checkouts(TimedQueuePool, args.requests)
+    print(f"checkout plain {plain:6.2f} us   timed {timed:6.2f} us   (+{timed - plain:.2f} us)")
+
+    started = time.perf_counter()
+    body, _ = render_latest()
+    print(f"scrape   {(time.perf_counter() - started) * 1000:.2f} ms for {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from fastapi.testclient import TestClient
+from jose import jwt
+from passlib.hash import bcrypt
+
+from app.core.config import settings
+from app.core.security import ALGORITHM, SECRET_KEY
+from app.models.user import User
+from app.schemas.user import UserCreate, UserRole, UserUpdate
+from app.services.user import user_service
+
+
+def test_role_change_applies_to_issued_tokens(app, db):
+    user = user_service.create(db, obj_in=UserCreate(
+        username="head", email="head@example.com", role=UserRole.ADMIN, password="secret-password"
+    ))
+    client = TestClient(app)
+    response = client.post(
+        f"{settings.API_V1_STR}/auth/login", data={"username": "head", "password": "secret-password"}
+    )
+    token = response.json()["access_token"]
+    assert "role" not in jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Admin only
+    assert client.get(f"{settings.API_V1_STR}/auth/principal-cache", headers=headers).status_code == 200
+    user_service.update(db, db_obj=user, obj_in=UserUpdate(role=UserRole.COOK))
+    assert client.get(f"{settings.API_V1_STR}/auth/principal-cache", headers=headers).status_code == 403
+
+
+def _login(client: TestClient, username: str, password: str) -> dict:
+    response = client.post(f"{settings.API_V1_STR}/auth/login", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_rehash_at_login_keeps_issued_tokens_valid(app, db):
+    user = user_service.create(db, obj_in=UserCreate(
+        username="cook", email="cook@example.com", role=UserRole.COOK, password="secret-password"
+    ))
+    client = TestClient(app)
+    issued_before = _login(client, "cook", "secret-password")
+
+    # A hash with another bcrypt cost is re-hashed at the next login.
+    outdated_hash = bcrypt.using(rounds=4).hash("secret-password")
+    db.query(User).filter(User.id == user.id).update({User.password_hash: outdated_hash})
+    db.commit()
+    _login(client, "cook", "secret-password")
+    db.refresh(user)
+    assert user.password_hash != outdated_hash
+
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_before).status_code == 200
+
+    # A password change does revoke them.
+    user_service.update(db, db_obj=user, obj_in=UserUpdate(password="new-password"))
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_before).status_code == 403
+    issued_after = _login(client, "cook", "new-password")
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_after).status_code == 200
+
+
+def test_token_newer_than_the_cached_user_reloads_it(app, db):
+    user = user_service.create(db, obj_in=UserCreate(
+        username="cook", email="cook@example.com", role=UserRole.COOK, password="secret-password"
+    ))
+    client = TestClient(app)
+    issued_before = _login(client, "cook", "secret-password")
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_before).status_code == 200  # Now cached
+
+    # Changed through another worker: this process's cache is not invalidated.
+    db.query(User).filter(User.id == user.id).update({
+        User.password_hash: bcrypt.using(rounds=4).hash("new-password"),
+        User.credential_version: User.credential_version + 1,
+    })
+    db.commit()
+
+    issued_after = _login(client, "cook", "new-password")
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_after).status_code == 200
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=issued_before).status_code == 403
@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+
+from app.core import database
+from app.core.config import settings
+from app.core.read_your_writes import COOKIE_NAME, encode_until
+from app.schemas.user import UserCreate, UserRole
+from app.services.user import user_service
+
+
+def test_reads_after_a_committed_write_go_to_the_primary(app, db, monkeypatch):
+    # The test database stands in for a replica: it is up and never lags.
+    router = database.ReplicaRouter([settings.DATABASE_URL])
+    picks = []
+    pick = router._pick
+    monkeypatch.setattr(router, "_pick", lambda: picks.append(pick()) or picks[-1])
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", [settings.DATABASE_URL])
+
+    user_service.create(db, obj_in=UserCreate(
+        username="head", email="head@example.com", role=UserRole.ADMIN, password="secret-password"
+    ))
+    client = TestClient(app)
+    response = client.post(
+        f"{settings.API_V1_STR}/auth/login", data={"username": "head", "password": "secret-password"}
+    )
+    assert COOKIE_NAME not in response.cookies  # Nothing written
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    ingredients = f"{settings.API_V1_STR}/ingredients/"
+    recipe_items = f"{settings.API_V1_STR}/recipe-items/"  # A (sync) replica read
+    rice = {"name": "rice", "quantity_grams": 1000, "delivery_date": "2026-10-01T00:00:00", "low_threshold_grams": 0}
+    try:
+        assert client.get(recipe_items, headers=headers).status_code == 200
+        assert picks.pop() is router.replicas[0]
+
+        # A failed write starts no window.
+        client.post(ingredients, headers=headers, json=rice)
+        response = client.post(ingredients, headers=headers, json=rice)
+        assert response.status_code == 400 and COOKIE_NAME not in response.cookies
+
+        # The committed one did; another process honours the cookie as well.
+        assert COOKIE_NAME in client.cookies
+        other_process = TestClient(app, cookies={COOKIE_NAME: client.cookies[COOKIE_NAME]})
+        assert other_process.get(recipe_items, headers=headers).status_code == 200
+        assert picks.pop() is None
+
+        # An expired or forged cookie does not.
+        for value in (encode_until(0), "9999999999.000.forged"):
+            assert TestClient(app, cookies={COOKIE_NAME: value}).get(recipe_items, headers=headers).status_code == 200
+            assert picks.pop() is router.replicas[0]
+    finally:
+        for replica in router.replicas:
+            replica.engine.dispose()
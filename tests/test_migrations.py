@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+from alembic import command
+from alembic.script import ScriptDirectory
+from sqlalchemy import (
+    Column, DateTime, Enum, ForeignKey, Integer, MetaData, String, Table, create_engine, func, inspect, select, text,
+)
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.database import Base
+from app.core.schema import SchemaNotMigratedError, alembic_config, prepare_database
+from app.services.serving_partition import serving_partition_service
+
+# The schema as the first release created it, before any migration existed.
+baseline = MetaData()
+users = Table(
+    "users", baseline,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("username", String(50), unique=True, index=True, nullable=False),
+    Column("email", String(100), unique=True, index=True, nullable=False),
+    Column("role", Enum("ADMIN", "MANAGER", "COOK", name="userrole"), nullable=False),
+    Column("password_hash", String, nullable=False),
+    Column("created_at", DateTime),
+)
+ingredients = Table(
+    "ingredients", baseline,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("name", String(100), unique=True, index=True, nullable=False),
+    Column("quantity_grams", Integer, nullable=False),
+    Column("delivery_date", DateTime, nullable=False),
+    Column("low_threshold_grams", Integer, nullable=False),
+)
+meals = Table(
+    "meals", baseline,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("name", String(100), unique=True, index=True, nullable=False),
+    Column("created_by_id", UUID(as_uuid=True), ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime),
+)
+recipe_items = Table(
+    "recipe_items", baseline,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("meal_id", UUID(as_uuid=True), ForeignKey("meals.id"), nullable=False),
+    Column("ingredient_id", UUID(as_uuid=True), ForeignKey("ingredients.id"), nullable=False),
+    Column("amount_grams", Integer, nullable=False),
+)
+serving_logs = Table(
+    "serving_logs", baseline,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("meal_id", UUID(as_uuid=True), ForeignKey("meals.id"), nullable=False),
+    Column("user_id", UUID(as_uuid=True), ForeignKey("users.id"), nullable=False),
+    Column("served_at", DateTime, nullable=True),
+    Column("portions", Integer, nullable=False),
+)
+
+
+@pytest.fixture
+def baseline_engine(scratch_database_url):
+    engine = create_engine(scratch_database_url)
+    baseline.create_all(engine)
+    now = datetime.now()
+    cook, rice, flour, porridge = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(users.insert().values(
+            id=cook, username="cook", email="cook@example.com", role="COOK", password_hash="x", created_at=now
+        ))
+        conn.execute(ingredients.insert(), [
+            {"id": rice, "name": "rice", "quantity_grams": 1000, "delivery_date": now, "low_threshold_grams": 0},
+            # Already below its threshold: has to get an open alert
+            {"id": flour, "name": "flour", "quantity_grams": 100, "delivery_date": now, "low_threshold_grams": 500},
+        ])
+        conn.execute(meals.insert().values(id=porridge, name="porridge", created_by_id=cook, created_at=now))
+        conn.execute(recipe_items.insert(), [
+            {"id": uuid.uuid4(), "meal_id": porridge, "ingredient_id": rice, "amount_grams": 30},
+            {"id": uuid.uuid4(), "meal_id": porridge, "ingredient_id": flour, "amount_grams": 10},
+        ])
+        conn.execute(serving_logs.insert(), [
+            {"id": uuid.uuid4(), "meal_id": porridge, "user_id": cook, "served_at": now - timedelta(days=40), "portions": 2},
+            {"id": uuid.uuid4(), "meal_id": porridge, "user_id": cook, "served_at": now, "portions": 1},
+            {"id": uuid.uuid4(), "meal_id": porridge, "user_id": cook, "served_at": None, "portions": 1},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def test_app_refuses_to_start_on_an_unmigrated_database(baseline_engine):
+    with pytest.raises(SchemaNotMigratedError, match="alembic upgrade head"):
+        prepare_database(baseline_engine)
+    # Nothing was created against the old tables.
+    assert not inspect(baseline_engine).has_table("serving_log_items")
+
+
+def test_upgrade_from_the_baseline_schema(baseline_engine):
+    config = alembic_config()
+    with baseline_engine.begin() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+
+    prepare_database(baseline_engine)  # At head now
+    Base.metadata.create_all(bind=baseline_engine)  # What the app crashed on before migrating
+
+    with baseline_engine.connect() as conn:
+        assert serving_partition_service.is_partitioned(conn, "serving_logs")
+        assert serving_partition_service.is_partitioned(conn, "serving_log_items")
+        assert conn.execute(text(
+            "SELECT count(*), count(served_at), sum(portions) FROM serving_logs"
+        )).one() == (3, 3, 4)
+        consumed = dict(conn.execute(text(
+            "SELECT i.name, sum(s.grams) FROM serving_log_items s JOIN ingredients i ON i.id = s.ingredient_id "
+            "GROUP BY i.name"
+        )).all())
+        assert consumed == {"rice": 4 * 30, "flour": 4 * 10}
+        assert conn.execute(text("SELECT credential_version FROM users")).scalars().all() == [0]
+        assert conn.execute(text("SELECT sum(portions) FROM daily_meal_servings")).scalar() == 4
+        assert conn.execute(text("SELECT sum(used_grams) FROM daily_ingredient_usage")).scalar() == 4 * 40
+        assert conn.execute(text("SELECT max_portions_possible FROM meal_estimates")).scalars().all() == [10]
+        assert conn.execute(text("SELECT key, status FROM alerts")).all() == [
+            (f"low_stock:{conn.execute(select(ingredients.c.id).where(ingredients.c.name == 'flour')).scalar()}", "ACTIVE")
+        ]
+
+    indexes = {index["name"] for index in inspect(baseline_engine).get_indexes("recipe_items")}
+    assert {"ix_recipe_items_meal_id", "ix_recipe_items_ingredient_id"} <= indexes
+    assert set(Base.metadata.tables) <= set(inspect(baseline_engine).get_table_names())
+
+
+def test_empty_database_is_created_at_head(scratch_database_url):
+    engine = create_engine(scratch_database_url)
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    try:
+        prepare_database(engine)
+        prepare_database(engine)  # Second start: finds it at head
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == head
+            assert serving_partition_service.is_partitioned(conn, "serving_logs")
+    finally:
+        engine.dispose()
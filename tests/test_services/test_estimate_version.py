@@ -0,0 +1,25 @@
+from app.schemas.meal import MealCreate, RecipeItemCreate
+from app.services.estimate import estimate_service
+from app.services.meal import meal_service
+
+
+def test_removing_a_meal_advances_the_store_version(db, cook, make_ingredient):
+    rice = make_ingredient("rice", 1000)
+    porridge, risotto = (
+        meal_service.create_with_recipe(
+            db, obj_in=MealCreate(name=name, recipe=[RecipeItemCreate(ingredient_id=rice.id, amount_grams=30)]),
+            created_by_id=cook.id,
+        )
+        for name in ("porridge", "risotto")
+    )
+    estimates, version = estimate_service.get_estimates(db)
+    assert [estimate.meal_name for estimate in estimates] == ["porridge", "risotto"]
+
+    # risotto holds the highest row version: without it the remaining rows' maximum goes back.
+    meal_service.remove(db, id=str(risotto.id))
+    estimates, after_removal = estimate_service.get_estimates(db)
+    assert [estimate.meal_name for estimate in estimates] == ["porridge"]
+    assert after_removal > version
+
+    meal_service.remove(db, id=str(porridge.id))
+    assert estimate_service.get_estimates(db) == ([], after_removal + 1)
@@ -0,0 +1,18 @@
+import gzip
+
+from app.core.config import settings
+from app.services.logs import LogService
+
+
+def test_unlimited_tail_of_a_compressed_file_reads_in_bounded_windows(tmp_path, monkeypatch):
+    path = tmp_path / "app.log.1.gz"
+    lines = [f"2026-10-17 12:00:{second:02d} {'ERROR' if second % 3 else 'INFO'} line {second}" for second in range(60)]
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    monkeypatch.setattr(settings, "LOG_COMPRESSED_CACHE_LINES", 7)
+
+    errors = [line for line in lines if " ERROR " in line]
+    assert [line for _, line in LogService().tail(str(path), level="ERROR")] == errors[::-1]
+    assert [line for _, line in LogService().tail(str(path))] == lines[::-1]
+    # Not a multiple of the window: the last one is partial.
+    assert len(errors) % 7 and len(lines) % 7
@@ -0,0 +1,49 @@
+import pytest
+
+from app.core.sql_instrumentation import QueryBudgetExceeded, fingerprint, track_queries
+from app.models.ingredient import Ingredient
+from app.schemas.meal import MealCreate, RecipeItemCreate
+from app.services.meal import meal_service
+
+RECIPE_LINES = 30
+
+
+def _recipe(make_ingredient):
+    return [
+        RecipeItemCreate(ingredient_id=make_ingredient(f"ingredient-{line}", 10000).id, amount_grams=10 + line)
+        for line in range(RECIPE_LINES)
+    ]
+
+
+def test_create_with_recipe_runs_a_constant_number_of_queries(db, cook, make_ingredient):
+    meal_in = MealCreate(name="stew", recipe=_recipe(make_ingredient))
+    cook_id = cook.id
+    db.expire_all()
+
+    # Fails on the query that goes over: looking ingredients up line by line would run
+    # one statement RECIPE_LINES times (40 queries in all instead of 10).
+    with track_queries("create meal", query_budget=12, repeat_budget=2, action="raise") as stats:
+        meal = meal_service.create_with_recipe(db, obj_in=meal_in, created_by_id=cook_id)
+
+    ingredient_checks = [
+        count for statement, count in stats.fingerprints.items() if statement.startswith("SELECT ingredients.id FROM")
+    ]
+    assert ingredient_checks == [1]
+    assert len(meal.recipe_items) == RECIPE_LINES
+
+
+def test_budget_catches_a_per_line_lookup(db, make_ingredient):
+    ids = [make_ingredient(f"ingredient-{line}", 10000).id for line in range(5)]
+    db.expire_all()
+
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        with track_queries("lookup loop", repeat_budget=2, action="raise"):
+            for ingredient_id in ids:
+                db.query(Ingredient).filter(Ingredient.id == ingredient_id).first()
+
+
+def test_fingerprint_ignores_the_length_of_in_lists():
+    statement = "SELECT ingredients.id FROM ingredients WHERE ingredients.id IN ({})"
+    two = statement.format("%(id_1_1)s::UUID, %(id_1_2)s::UUID")
+    three = statement.format("%(id_1_1)s::UUID, %(id_1_2)s::UUID, %(id_1_3)s::UUID")
+    assert fingerprint(two) == fingerprint(three) == statement.format("?, ...")
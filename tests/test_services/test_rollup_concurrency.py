@@ -0,0 +1,82 @@
+import threading
+
+from sqlalchemy import cast, func, select, Date
+
+from app.core.database import SessionLocal
+from app.models.daily_rollup import DailyIngredientUsage, DailyMealServing
+from app.models.meal import Meal
+from app.models.recipe_item import RecipeItem
+from app.models.serving_log import ServingLog, ServingLogItem
+from app.schemas.serving_log import ServeMealRequest
+from app.services.rollup import rollup_service
+from app.services.serving import serving_service
+
+SERVING_THREADS = 8
+SERVES_PER_THREAD = 10
+REBUILDS = 5
+
+
+def test_rebuild_while_serving_keeps_rollups_exact(db, cook, make_ingredient):
+    rice = make_ingredient("rice", 1_000_000)
+    meal = Meal(name="rice", created_by_id=cook.id)
+    meal.recipe_items = [RecipeItem(ingredient_id=rice.id, amount_grams=30)]
+    db.add(meal)
+    db.commit()
+    meal_id, cook_id = meal.id, cook.id  # Loaded here: the threads must not share `db`
+
+    start = threading.Barrier(SERVING_THREADS + 1)
+    errors = []
+
+    def serve_repeatedly() -> None:
+        session = SessionLocal()
+        try:
+            start.wait()
+            for _ in range(SERVES_PER_THREAD):
+                serving_service.serve_meal(
+                    session,
+                    meal_id=str(meal_id),
+                    serve_request=ServeMealRequest(user_id=cook_id, portions=1),
+                    serving_user_id=str(cook_id),
+                )
+        except Exception as e:  # Reported below: an assertion in a thread would go unnoticed
+            errors.append(e)
+        finally:
+            session.close()
+
+    def rebuild_repeatedly() -> None:
+        session = SessionLocal()
+        try:
+            start.wait()
+            for _ in range(REBUILDS):
+                rollup_service.rebuild(session)
+                session.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=serve_repeatedly) for _ in range(SERVING_THREADS)]
+    threads.append(threading.Thread(target=rebuild_repeatedly))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    served = SERVING_THREADS * SERVES_PER_THREAD
+    meal_rollups = db.execute(
+        select(DailyMealServing.day, DailyMealServing.meal_id, DailyMealServing.portions, DailyMealServing.servings)
+    ).all()
+    assert meal_rollups == db.execute(
+        select(cast(ServingLog.served_at, Date), ServingLog.meal_id, func.sum(ServingLog.portions), func.count())
+        .group_by(cast(ServingLog.served_at, Date), ServingLog.meal_id)
+    ).all()
+    assert sum(row.portions for row in meal_rollups) == served
+    usage_rollups = db.execute(
+        select(DailyIngredientUsage.day, DailyIngredientUsage.ingredient_id, DailyIngredientUsage.used_grams)
+    ).all()
+    assert usage_rollups == db.execute(
+        select(cast(ServingLogItem.served_at, Date), ServingLogItem.ingredient_id, func.sum(ServingLogItem.grams))
+        .group_by(cast(ServingLogItem.served_at, Date), ServingLogItem.ingredient_id)
+    ).all()
+    assert sum(row.used_grams for row in usage_rollups) == served * 30
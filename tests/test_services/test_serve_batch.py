@@ -0,0 +1,62 @@
+import uuid
+
+import pytest
+
+from app.models.meal import Meal
+from app.models.recipe_item import RecipeItem
+from app.schemas.serving_log import ServeBatchItem, ServeBatchMode, ServeBatchRequest
+from app.services.serving import serving_service
+
+
+@pytest.fixture
+def meals_with_a_deleted_ingredient(db, cook, make_ingredient, monkeypatch):
+    """Two meals; the recipe of the second still names an ingredient deleted meanwhile."""
+    rice = make_ingredient("rice", 1000)
+    meals = [Meal(name=name, created_by_id=cook.id) for name in ("porridge", "pilaf")]
+    for meal in meals:
+        meal.recipe_items = [RecipeItem(ingredient_id=rice.id, amount_grams=30)]
+    db.add_all(meals)
+    db.commit()
+    porridge, pilaf = meals
+
+    get_recipes = serving_service.get_recipes
+
+    def recipes_read_before_the_deletion(session, *, meal_ids):
+        recipes = get_recipes(session, meal_ids=meal_ids)
+        recipes[pilaf.id][uuid.uuid4()] = 10
+        return recipes
+
+    monkeypatch.setattr(serving_service, "get_recipes", recipes_read_before_the_deletion)
+    return rice, porridge, pilaf
+
+
+def _batch(cook, meals, mode):
+    return ServeBatchRequest(
+        user_id=cook.id, mode=mode, items=[ServeBatchItem(meal_id=meal.id, portions=1) for meal in meals]
+    )
+
+
+def test_best_effort_rejects_only_the_item_with_a_missing_ingredient(db, cook, meals_with_a_deleted_ingredient):
+    rice, porridge, pilaf = meals_with_a_deleted_ingredient
+
+    response = serving_service.serve_batch(
+        db, batch_request=_batch(cook, [porridge, pilaf], ServeBatchMode.BEST_EFFORT), serving_user_id=str(cook.id)
+    )
+
+    assert [log.meal_id for log in response.served] == [porridge.id]
+    assert [(rejection.meal_id, rejection.shortages) for rejection in response.rejected] == [(pilaf.id, [])]
+    assert "not found in inventory" in response.rejected[0].reason
+    db.refresh(rice)
+    assert rice.quantity_grams == 1000 - 30
+
+
+def test_all_or_nothing_still_aborts_on_a_missing_ingredient(db, cook, meals_with_a_deleted_ingredient):
+    rice, porridge, pilaf = meals_with_a_deleted_ingredient
+
+    with pytest.raises(ValueError, match="not found in inventory"):
+        serving_service.serve_batch(
+            db, batch_request=_batch(cook, [porridge, pilaf], ServeBatchMode.ALL_OR_NOTHING),
+            serving_user_id=str(cook.id),
+        )
+    db.refresh(rice)
+    assert rice.quantity_grams == 1000
@@ -0,0 +1,76 @@
+import threading
+
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal
+from app.models.ingredient import Ingredient
+from app.models.meal import Meal
+from app.models.recipe_item import RecipeItem
+from app.models.serving_log import ServingLog, ServingLogItem
+from app.schemas.serving_log import ServeMealRequest
+from app.services.serving import serving_service
+from app.services.stock import InsufficientStockError
+
+THREADS = 16
+ATTEMPTS_PER_THREAD = 5
+
+
+def test_concurrent_serves_never_oversell(db, cook, make_ingredient):
+    # 1000 // 30 = 33 portions of rice, 5000 // 100 = 50 of carrots: 33 serves can succeed.
+    rice = make_ingredient("rice", 1000)
+    carrot = make_ingredient("carrot", 5000)
+    meal = Meal(name="rice and carrots", created_by_id=cook.id)
+    meal.recipe_items = [
+        RecipeItem(ingredient_id=rice.id, amount_grams=30),
+        RecipeItem(ingredient_id=carrot.id, amount_grams=100),
+    ]
+    db.add(meal)
+    db.commit()
+    initial = {rice.id: 1000, carrot.id: 5000}
+    expected_serves = min(1000 // 30, 5000 // 100)
+
+    start = threading.Barrier(THREADS)
+    outcomes = {"served": 0, "short": 0}
+    errors = []
+    lock = threading.Lock()
+
+    def serve_repeatedly() -> None:
+        session = SessionLocal()
+        try:
+            start.wait()
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    serving_service.serve_meal(
+                        session,
+                        meal_id=str(meal.id),
+                        serve_request=ServeMealRequest(user_id=cook.id, portions=1),
+                        serving_user_id=str(cook.id),
+                    )
+                    outcome = "served"
+                except InsufficientStockError:
+                    outcome = "short"
+                with lock:
+                    outcomes[outcome] += 1
+        except Exception as e:  # Reported below: an assertion in a thread would go unnoticed
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=serve_repeatedly) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert outcomes == {"served": expected_serves, "short": THREADS * ATTEMPTS_PER_THREAD - expected_serves}
+
+    db.expire_all()
+    stock = dict(db.execute(select(Ingredient.id, Ingredient.quantity_grams)).all())
+    consumed = dict(db.execute(
+        select(ServingLogItem.ingredient_id, func.sum(ServingLogItem.grams)).group_by(ServingLogItem.ingredient_id)
+    ).all())
+    assert all(quantity >= 0 for quantity in stock.values())
+    assert stock == {ingredient_id: grams - consumed[ingredient_id] for ingredient_id, grams in initial.items()}
+    assert stock == {rice.id: 1000 - expected_serves * 30, carrot.id: 5000 - expected_serves * 100}
+    assert db.execute(select(func.count()).select_from(ServingLog)).scalar() == expected_serves
@@ -0,0 +1,23 @@
+from sqlalchemy import select
+
+from app.models.alert import Alert, AlertStatus
+from app.tasks.alerts import sync_low_stock_alerts
+
+
+def test_sync_raises_alerts_for_stock_never_written(db, make_ingredient):
+    # Inserted directly: no stock write went through alert_service, so no alert yet.
+    low = make_ingredient("flour", 100, low_threshold_grams=500)
+    make_ingredient("salt", 900, low_threshold_grams=500)
+    assert db.execute(select(Alert)).scalars().all() == []
+
+    assert sync_low_stock_alerts()["status"] == "success"
+    assert sync_low_stock_alerts()["low_stock"] == 1  # Idempotent: still one open alert
+
+    alerts = db.execute(select(Alert)).scalars().all()
+    assert [(alert.ingredient_id, alert.status) for alert in alerts] == [(low.id, AlertStatus.ACTIVE)]
+
+    low.quantity_grams = 1000
+    db.commit()
+    sync_low_stock_alerts()
+    db.expire_all()
+    assert db.execute(select(Alert.status)).scalars().all() == [AlertStatus.RESOLVED]
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.ws.broadcast import MemoryBackend, MemoryBroker, RedisBackend
+from app.ws.inventory import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager, inventory_update_event
+
+
+class FakeWebSocket:
+    """Records what the server sends; a stalled one never completes a send."""
+
+    def __init__(self, *, stalled: bool = False):
+        self.stalled = stalled
+        self.sent = []
+        self.close_code = None
+        self.received = asyncio.Event()
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(text))
+        self.received.set()
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+async def _wait_for(condition, timeout: float = 2.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_broadcast_reaches_clients_of_another_manager():
+    async def scenario():
+        broker = MemoryBroker()
+        manager_a = ConnectionManager(MemoryBackend(broker))
+        manager_b = ConnectionManager(MemoryBackend(broker))
+        subscribed = FakeWebSocket()
+        other_topic = FakeWebSocket()
+        await manager_b.connect(subscribed, topics=["inventory.update"])
+        await manager_b.connect(other_topic, topics=["alerts.*"])
+        await manager_a.start()
+        try:
+            event = inventory_update_event("ingredient-1", 1500)
+            await manager_a.broadcast(event, key="ingredient-1")
+            await asyncio.wait_for(subscribed.received.wait(), 2.0)
+            await asyncio.sleep(0.05)  # Anything else in flight arrives meanwhile
+            return event, subscribed.sent, other_topic.sent
+        finally:
+            await manager_a.stop()
+            await manager_b.stop()
+
+    event, subscribed_received, other_received = asyncio.run(scenario())
+    assert subscribed_received == [event]
+    assert other_received == []
+
+
+def test_client_overflowing_its_queue_is_evicted(monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 2)
+
+    async def scenario():
+        manager = ConnectionManager(MemoryBackend())
+        slow = FakeWebSocket(stalled=True)
+        fast = FakeWebSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+        try:
+            # The slow client's sender holds the first message, the next two fill its queue
+            # and the fourth overflows it; the fast client keeps up with the pace.
+            for quantity in range(4):
+                await manager.broadcast(inventory_update_event("ingredient-1", quantity))
+                await asyncio.sleep(0.02)
+            await _wait_for(lambda: slow.close_code is not None and len(fast.sent) == 4)
+            return slow, fast, manager.active_connections
+        finally:
+            await manager.stop()
+
+    slow, fast, active = asyncio.run(scenario())
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert slow not in active
+    assert fast in active and fast.close_code is None
+
+
+def test_client_stalling_a_send_is_evicted(monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        manager = ConnectionManager(MemoryBackend())
+        stalled = FakeWebSocket(stalled=True)
+        await manager.connect(stalled)
+        try:
+            await manager.broadcast(inventory_update_event("ingredient-1", 10))
+            await _wait_for(lambda: stalled.close_code is not None)
+            return stalled, manager.active_connections
+        finally:
+            await manager.stop()
+
+    stalled, active = asyncio.run(scenario())
+    assert stalled.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert stalled not in active
+
+
+def test_redis_backend_carries_broadcasts_between_managers():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    def redis_backend(server) -> RedisBackend:
+        backend = RedisBackend("redis://unused", "ws-test")
+        backend.redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        return backend
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        manager_a = ConnectionManager(redis_backend(server))
+        manager_b = ConnectionManager(redis_backend(server))
+        client = FakeWebSocket()
+        await manager_b.connect(client, topics=["inventory.update"])
+        await manager_a.start()
+        try:
+            event = inventory_update_event("ingredient-1", 1500)
+            # The listener subscribes in the background: publish until it is in.
+            while not client.received.is_set():
+                await manager_a.broadcast(event, key="ingredient-1")
+                await asyncio.sleep(0.05)
+            return event, client.sent
+        finally:
+            await manager_a.stop()
+            await manager_b.stop()
+
+    event, received = asyncio.run(asyncio.wait_for(scenario(), 5.0))
+    assert received[0] == event